@@ -0,0 +1,47 @@
+import hashlib
+import os
+import pandas as pd
+
+# Workbook holding one sheet per analysis category
+WORKBOOK_FILE = 'Aadhar_modified.xlsx'
+
+# Category sheets shown in the dashboards, in display order (Zone is optional)
+CATEGORY_NAMES = ['Gender', 'Education', 'Experience', 'Age', 'Zone']
+
+# Short names of the metric columns, by position after the Category column
+METRIC_NAMES = [
+    'CAP LRM Cohort',
+    'CAP 12 Cohort',
+    'Combined KPI Achievement',
+    'Top 10% CAP (Combined)',
+    'Bottom 10% CAP (Combined)',
+    'Performance Multiple (Combined)',
+    'KPI 1 Achievement',
+    'Top 10% CAP (KPI 1)',
+    'Bottom 10% CAP (KPI 1)',
+    'Performance Multiple (KPI 1)',
+    'Time to First Sale',
+    'CAR2CATPO Ratio',
+    'Attrited Employees',
+    'Average Residency (All)',
+    'Average Residency (Top 100)',
+    'Early Attrition',
+    'Infant Attrition'
+]
+
+def load_category_sheets(workbook=WORKBOOK_FILE):
+    """Load every category sheet present in the workbook, keyed by category name"""
+    excel = pd.ExcelFile(workbook)
+    return {name: pd.read_excel(excel, sheet_name=name)
+            for name in CATEGORY_NAMES if name in excel.sheet_names}
+
+def files_fingerprint(*paths):
+    """Return a content hash of the given files; missing files contribute nothing"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode('utf-8'))
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+    return digest.hexdigest()
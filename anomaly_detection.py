@@ -0,0 +1,50 @@
+import numpy as np
+
+from metric_comparison import DIMENSION, METRIC, CATEGORY, VALUE
+
+# Robust z-score beyond which a value is flagged (Iglewicz and Hoaglin's recommended cut-off)
+DEFAULT_THRESHOLD = 3.5
+
+# Scales the median absolute deviation to the standard deviation of a normal distribution
+MAD_SCALE = 0.6745
+
+def flag_anomalies(table, threshold=DEFAULT_THRESHOLD):
+    """
+    Add robust z-scores and anomaly flags to a long metric table.
+
+    Each value is compared with the other categories of the same metric in the same
+    sheet: z = 0.6745 * (value - median) / MAD. All groups are scored together with
+    groupby transforms, so the cost grows with the number of rows, not of groups.
+    Groups whose values are all equal to the median (MAD of zero) are never flagged.
+    """
+    groups = [table.index.get_level_values(METRIC), table.index.get_level_values(DIMENSION)]
+    values = table[VALUE]
+    median = values.groupby(groups).transform('median')
+    deviation = (values - median).abs()
+    mad = deviation.groupby(groups).transform('median')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        robust_z = MAD_SCALE * (values - median) / mad
+    robust_z = robust_z.where(mad > 0, 0.0)
+
+    return table.assign(median=median, robust_z=robust_z, flagged=robust_z.abs() > threshold)
+
+def flagged_cells(scored):
+    """Return the flagged cells of a scored table as rows, most extreme first"""
+    flagged = scored[scored['flagged']].reset_index()
+    order = np.argsort(-flagged['robust_z'].abs().to_numpy(), kind='stable')
+    return flagged.iloc[order][[DIMENSION, CATEGORY, METRIC, VALUE, 'median', 'robust_z']].reset_index(drop=True)
+
+def anomaly_insight(scored, metrics):
+    """Describe the flagged cells of the given metrics in one sentence, or return an empty string"""
+    cells = flagged_cells(scored)
+    cells = cells[cells[METRIC].isin(metrics)]
+    if cells.empty:
+        return ""
+
+    notes = [
+        f"{row[CATEGORY]} on {row[METRIC]} ({row[VALUE]:.2f} vs a median of {row['median']:.2f}, "
+        f"robust z {row['robust_z']:+.1f})"
+        for _, row in cells.iterrows()
+    ]
+    return "Flagged as unusual: " + "; ".join(notes) + "."
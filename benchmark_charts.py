@@ -0,0 +1,199 @@
+"""
+Aadhar Chart Rendering Benchmark
+--------------------------------
+Times every dashboard chart function for each category sheet and for synthetic
+categories of 10, 100 and 1000 rows, and gates on regressions against a stored
+baseline.
+
+Usage:
+    python benchmark_charts.py                      # run and compare with the baseline
+    python benchmark_charts.py --update-baseline    # run and store the results as the new baseline
+    python benchmark_charts.py --sizes 10 100 --repeat 5 --threshold 0.3
+
+Each run writes a versioned results file to benchmarks/results/. The script exits
+with status 1 when any chart is slower, uses more memory or produces a larger PNG
+than in the baseline by more than the threshold, or when there is no baseline of
+the current results schema to compare with.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime
+import matplotlib
+import pandas as pd
+import seaborn as sns
+
+from aadhar_data import WORKBOOK_FILE, load_category_sheets
+from chart_export import render_chart_png
+from create_zone_sample import generate_zone_frame
+from streamlit_dashboard_simple import CHART_FUNCTIONS
+
+# Bump when the layout of the results file changes
+RESULTS_SCHEMA_VERSION = 1
+
+BENCHMARK_DIR = 'benchmarks'
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'chart_baseline.json')
+
+# Changes smaller than these are treated as noise, whatever the relative threshold
+MIN_TIME_DELTA = 0.05  # seconds
+MIN_MEMORY_DELTA = 512  # KiB
+MIN_PNG_DELTA = 4096  # bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Aadhar dashboard chart functions.")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[10, 100, 1000],
+                        help="Row counts of the synthetic categories to benchmark")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per chart (the median is kept)")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed relative slowdown before a chart counts as a regression")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline results file to compare against")
+    parser.add_argument('--update-baseline', action='store_true', help="Store this run as the new baseline")
+    args = parser.parse_args()
+
+    # Chart functions emit layout warnings on every call; they only add noise here
+    warnings.filterwarnings('ignore')
+
+    print("Aadhar Chart Rendering Benchmark")
+    print("--------------------------------")
+
+    datasets = load_datasets(args.sizes)
+    results = []
+    for dataset, (name, df) in datasets.items():
+        print(f"\nBenchmarking {dataset} ({len(df)} rows)...")
+        for chart_name, chart_function in CHART_FUNCTIONS.items():
+            result = benchmark_chart(chart_function, df, name, args.repeat)
+            result.update({'dataset': dataset, 'rows': len(df), 'chart': chart_name})
+            results.append(result)
+            print(f"  {chart_name:<26} {result['wall_time_s']:8.3f}s "
+                  f"{result['peak_memory_kb']:10.0f} KiB {result['png_bytes']:10d} B")
+
+    report = {
+        'schema_version': RESULTS_SCHEMA_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'repeat': args.repeat,
+        'results': results
+    }
+    results_file = write_results(report)
+    print(f"\nResults written to {results_file}")
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=4)
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    # Without a baseline there is nothing to gate on, which must not pass as "no regressions"
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}; run with --update-baseline on the reference "
+              f"machine to create one.")
+        return 1
+
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get('schema_version') != RESULTS_SCHEMA_VERSION:
+        print(f"Baseline schema version {baseline.get('schema_version')} does not match "
+              f"{RESULTS_SCHEMA_VERSION}; re-record it with --update-baseline on the reference machine.")
+        return 1
+
+    regressions = compare_with_baseline(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%} of the baseline:")
+        for message in regressions:
+            print(f"  {message}")
+        return 1
+
+    print(f"\nNo regressions beyond {args.threshold:.0%} of the baseline.")
+    return 0
+
+def load_datasets(sizes):
+    """Return the real category sheets plus seeded synthetic categories, keyed by dataset label"""
+    sheets = load_category_sheets()
+    datasets = {name: (name, df) for name, df in sheets.items()}
+
+    column_names = next(iter(sheets.values())).columns
+    for rows in sizes:
+        labels = [f"Branch {i:04d}" for i in range(rows)]
+        datasets[f"Synthetic {rows}"] = ("Zone", generate_zone_frame(labels, column_names, seed=rows))
+    return datasets
+
+def benchmark_chart(chart_function, df, name, repeat):
+    """Measure wall time, peak Python memory and PNG size of one chart"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        png_bytes = render_png(chart_function, df, name)
+        timings.append(time.perf_counter() - start)
+
+    # Memory tracing slows rendering down, so it gets a separate, untimed run
+    tracemalloc.start()
+    try:
+        render_png(chart_function, df, name)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'wall_time_s': round(statistics.median(timings), 4),
+        'peak_memory_kb': round(peak / 1024, 1),
+        'png_bytes': png_bytes
+    }
+
+def render_png(chart_function, df, name):
+    """Render a chart to PNG in memory the way the dashboard does and return the PNG size"""
+    png, _ = render_chart_png(chart_function, df, name)
+    return len(png)
+
+def environment_info():
+    """Versions that affect rendering speed, stored with every results file"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'matplotlib': matplotlib.__version__,
+        'seaborn': sns.__version__,
+        'pandas': pd.__version__,
+        'workbook': WORKBOOK_FILE
+    }
+
+def write_results(report):
+    """Write a timestamped results file and return its path"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"chart_benchmark_v{RESULTS_SCHEMA_VERSION}_{timestamp}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=4)
+    return path
+
+def compare_with_baseline(results, baseline, threshold):
+    """Return a message for every chart that regressed beyond the threshold"""
+    previous = {(r['dataset'], r['chart']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['dataset'], result['chart']))
+        if before is None:
+            continue
+
+        label = f"{result['dataset']} / {result['chart']}"
+        old_time, new_time = before['wall_time_s'], result['wall_time_s']
+        if new_time > old_time * (1 + threshold) and new_time - old_time > MIN_TIME_DELTA:
+            regressions.append(f"{label}: {old_time:.3f}s -> {new_time:.3f}s")
+
+        old_memory, new_memory = before['peak_memory_kb'], result['peak_memory_kb']
+        if new_memory > old_memory * (1 + threshold) and new_memory - old_memory > MIN_MEMORY_DELTA:
+            regressions.append(f"{label}: peak memory {old_memory:.0f} KiB -> {new_memory:.0f} KiB")
+
+        old_png, new_png = before['png_bytes'], result['png_bytes']
+        if new_png > old_png * (1 + threshold) and new_png - old_png > MIN_PNG_DELTA:
+            regressions.append(f"{label}: PNG size {old_png} B -> {new_png} B")
+    return regressions
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+"""
+Aadhar Recommendation Storage Stress Test
+-----------------------------------------
+Simulates concurrent dashboard sessions saving, loading, exporting and importing
+recommendations against each storage backend, and reports throughput, tail
+latency and lost updates.
+
+Usage:
+    python benchmark_recommendations.py                         # every backend, default load
+    python benchmark_recommendations.py --backends sqlite json --sessions 16 --operations 500
+    python benchmark_recommendations.py --keys 20000 --import-size 500
+
+Every session runs in its own process with its own backend instance, as separate
+dashboard servers sharing one store would, so no external services are needed.
+The store is seeded with `--keys` recommendations first. Sessions save and import
+into keys only they write, so after all sessions have closed their backends the
+final text of every such key is known; a key holding anything else is a lost
+update. Each run writes a versioned results file to benchmarks/results/ and the
+script exits with status 1 when any update was lost.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from recommendation_backends import (JsonFileBackend, SqliteBackend, WriteBehindBackend, SHARED_NAMESPACE,
+                                     namespace_chain, recommendation_key, team_namespace)
+
+# Bump when the layout of the results file changes
+RESULTS_SCHEMA_VERSION = 1
+
+BENCHMARK_DIR = 'benchmarks'
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+# Store layouts under test, each opened afresh in every session process
+BACKENDS = {
+    'json': lambda directory: JsonFileBackend(os.path.join(directory, 'recommendations.json')),
+    'sqlite': lambda directory: SqliteBackend(os.path.join(directory, 'recommendations.db')),
+    'write-behind': lambda directory: WriteBehindBackend(SqliteBackend(os.path.join(directory, 'recommendations.db')))
+}
+
+# Relative frequency of each session operation
+OPERATION_MIX = {'save': 70, 'load': 20, 'export': 5, 'import': 5}
+
+# Chart cards per category in the generated keys, as on the dashboard
+CHARTS_PER_CATEGORY = 9
+
+# Team every simulated session belongs to; loads resolve personal, team and shared text
+TEAM = 'Bench'
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress test the recommendation storage backends.")
+    parser.add_argument('--backends', nargs='*', choices=list(BACKENDS), default=list(BACKENDS),
+                        help="Backends to test")
+    parser.add_argument('--sessions', type=int, default=8, help="Concurrent sessions, one process each")
+    parser.add_argument('--operations', type=int, default=200, help="Operations per session")
+    parser.add_argument('--keys', type=int, default=2000, help="Recommendations stored before the run")
+    parser.add_argument('--import-size', type=int, default=100, help="Recommendations per import")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the operation sequence")
+    args = parser.parse_args()
+
+    print("Aadhar Recommendation Storage Stress Test")
+    print("-----------------------------------------")
+    print(f"{args.sessions} sessions x {args.operations} operations, {args.keys} stored recommendations")
+
+    results = []
+    for backend in args.backends:
+        print(f"\nStressing {backend}...")
+        result = stress_backend(backend, args)
+        results.append(result)
+        print_result(result)
+
+    report = {
+        'schema_version': RESULTS_SCHEMA_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'environment': environment_info(),
+        'settings': vars(args),
+        'results': results
+    }
+    results_file = write_results(report)
+    print(f"\nResults written to {results_file}")
+
+    lost = sum(result['lost_updates'] for result in results)
+    if lost:
+        print(f"\n{lost} lost update(s).")
+        return 1
+    print("\nNo lost updates.")
+    return 0
+
+def stress_backend(backend, args):
+    """Run every session against a freshly seeded store and return the aggregated result"""
+    directory = tempfile.mkdtemp(prefix=f"recommendation_stress_{backend}_")
+    try:
+        seed_store(backend, directory, args.keys)
+
+        # Sessions start together once every process is up
+        start_at = time.time() + 1.0 + 0.1 * args.sessions
+        with ProcessPoolExecutor(max_workers=args.sessions) as pool:
+            futures = [pool.submit(run_session, backend, directory, session, args.operations, args.import_size,
+                                   args.seed, start_at)
+                       for session in range(args.sessions)]
+            sessions = [future.result() for future in futures]
+
+        expected = {}
+        for session in sessions:
+            expected.update(session['expected'])
+        lost = count_lost_updates(backend, directory, expected)
+        return summarize(backend, sessions, start_at, lost, len(expected))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def seed_store(backend, directory, keys):
+    """Store `keys` shared recommendations before the sessions start"""
+    store = BACKENDS[backend](directory)
+    try:
+        store.put_records(((key, f"Seed recommendation {i}", 'seed', None)
+                           for i, key in enumerate(generate_keys('Seed', keys))), namespace=SHARED_NAMESPACE)
+    finally:
+        store.close()
+
+def generate_keys(prefix, count):
+    """Return `count` recommendation keys spread over categories of CHARTS_PER_CATEGORY charts"""
+    return [recommendation_key(f"{prefix}{i // CHARTS_PER_CATEGORY}", f"Chart {i % CHARTS_PER_CATEGORY}")
+            for i in range(count)]
+
+def run_session(backend, directory, session, operations, import_size, seed, start_at):
+    """
+    Run one simulated session and return its latencies, errors and the final
+    value it expects in every key it wrote.
+    """
+    rng = random.Random(seed * 1000 + session)
+    author = f"session{session}"
+    namespaces = namespace_chain(author, TEAM)
+    save_keys = generate_keys(f"Session{session}", CHARTS_PER_CATEGORY * 4)
+    import_keys = generate_keys(f"Import{session}", import_size)
+    export_file = os.path.join(directory, f"export_{session}.jsonl")
+    choices, weights = zip(*OPERATION_MIX.items())
+
+    latencies = {operation: [] for operation in OPERATION_MIX}
+    errors = {operation: 0 for operation in OPERATION_MIX}
+    expected = {}
+
+    store = BACKENDS[backend](directory)
+    time.sleep(max(0.0, start_at - time.time()))
+    started = time.time()
+    for n in range(operations):
+        operation = rng.choices(choices, weights)[0]
+        start = time.perf_counter()
+        try:
+            if operation == 'save':
+                key = rng.choice(save_keys)
+                # Half of the saves go to the team, the rest to shared
+                namespace = team_namespace(TEAM) if n % 2 else SHARED_NAMESPACE
+                value = f"{author} save {n}"
+                store.put(key, value, author=author, namespace=namespace)
+                expected[(namespace, key)] = value
+            elif operation == 'load':
+                store.load_all(namespaces)
+            elif operation == 'export':
+                with open(export_file, 'w') as f:
+                    for key, value in store.iter_records(None, namespaces):
+                        f.write(json.dumps({'key': key, 'value': value}) + "\n")
+            else:
+                records = [(key, f"{author} import {n}", author, None) for key in import_keys]
+                store.import_records(iter(records), None, SHARED_NAMESPACE)
+                expected.update(((SHARED_NAMESPACE, key), value) for key, value, _, _ in records)
+        except (sqlite3.Error, OSError):
+            errors[operation] += 1
+            continue
+        latencies[operation].append(time.perf_counter() - start)
+
+    # Closing flushes a write-behind cache, so it counts towards the session's time
+    store.close()
+    return {
+        'started': started,
+        'finished': time.time(),
+        'latencies': latencies,
+        'errors': errors,
+        'expected': expected
+    }
+
+def count_lost_updates(backend, directory, expected):
+    """Return how many keys do not hold the last value their session saved"""
+    store = BACKENDS[backend](directory)
+    try:
+        by_namespace = {}
+        for (namespace, key), value in expected.items():
+            by_namespace.setdefault(namespace, {})[key] = value
+        lost = 0
+        for namespace, values in by_namespace.items():
+            stored = store.load_all((namespace,))
+            lost += sum(1 for key, value in values.items() if stored.get(key) != value)
+        return lost
+    finally:
+        store.close()
+
+def percentile(values, fraction):
+    """Return the value below which `fraction` of the sorted values fall (nearest rank)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(backend, sessions, start_at, lost, written):
+    """Combine the session results into throughput, latency percentiles and error counts"""
+    elapsed = max(session['finished'] for session in sessions) - start_at
+    operations = {}
+    for operation in OPERATION_MIX:
+        latencies = [latency for session in sessions for latency in session['latencies'][operation]]
+        operations[operation] = {
+            'count': len(latencies),
+            'errors': sum(session['errors'][operation] for session in sessions),
+            'p50_ms': _milliseconds(percentile(latencies, 0.50)),
+            'p95_ms': _milliseconds(percentile(latencies, 0.95)),
+            'p99_ms': _milliseconds(percentile(latencies, 0.99)),
+            'max_ms': _milliseconds(max(latencies, default=None))
+        }
+    completed = sum(stats['count'] for stats in operations.values())
+    return {
+        'backend': backend,
+        'sessions': len(sessions),
+        'elapsed_s': round(elapsed, 3),
+        'operations_per_s': round(completed / elapsed, 1) if elapsed > 0 else None,
+        'keys_written': written,
+        'lost_updates': lost,
+        'operations': operations
+    }
+
+def _milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+def print_result(result):
+    print(f"  {result['operations_per_s']} ops/s over {result['elapsed_s']:.2f}s, "
+          f"{result['lost_updates']} of {result['keys_written']} written keys lost")
+    print(f"  {'operation':<10}{'count':>8}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for operation, stats in result['operations'].items():
+        cells = [stats[column] for column in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')]
+        print(f"  {operation:<10}{stats['count']:>8}{stats['errors']:>8}"
+              + "".join(f"{'-' if cell is None else f'{cell:.2f}':>10}" for cell in cells))
+
+def environment_info():
+    """Versions that affect storage speed, stored with every results file"""
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sqlite': sqlite3.sqlite_version,
+        'cpus': os.cpu_count()
+    }
+
+def write_results(report):
+    """Write a timestamped results file and return its path"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"recommendation_stress_v{RESULTS_SCHEMA_VERSION}_{timestamp}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=4)
+    return path
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+# Label of the bar that aggregates every category outside the top/bottom N
+OTHER_CATEGORY = 'Other'
+
+# Metric columns (by position) holding head counts, which are summed when aggregated;
+# every other metric is a rate and is averaged, weighted by the CAP LRM cohort size
+COUNT_POSITIONS = (1, 2, 13)
+WEIGHT_POSITION = 1
+
+def top_n_categories(df, stats, column, n, bottom=False, other=True):
+    """
+    Keep the N highest (or lowest) categories of a sheet by one metric column.
+
+    The selection is read from the precomputed rank index in the statistics table, so
+    no sort is needed per request. With `other`, the remaining categories are
+    collapsed into one aggregated "Other" row at the end. Rows keep their rank order.
+    """
+    if column not in stats or n >= len(df):
+        return df
+
+    order = np.asarray(stats[column]['order'])
+    ranked = order[:stats[column]['count']]
+    if bottom:
+        ranked = ranked[::-1]
+    keep = ranked[:n]
+
+    selected = df.iloc[keep]
+    if not other:
+        return selected
+
+    rest = np.setdiff1d(np.arange(len(df)), keep, assume_unique=True)
+    return pd.concat([selected, aggregate_categories(df.iloc[rest])], ignore_index=True)
+
+def aggregate_categories(df, label=OTHER_CATEGORY):
+    """Collapse several category rows into one: counts are summed, rates weighted by cohort size"""
+    return aggregate_groups(df, np.full(len(df), label, dtype=object))
+
+def aggregate_groups(df, groups):
+    """
+    Roll category rows up into one row per group label, in order of first appearance.
+
+    Head counts are summed; every other metric is averaged weighted by the CAP LRM cohort
+    size of the rows that have a value, falling back to a plain mean when the group has
+    no cohort sizes. All groups are aggregated together in one groupby pass.
+    """
+    columns = df.columns
+    groups = pd.Series(np.asarray(groups, dtype=object), index=df.index, name=columns[0])
+    values = df[columns[1:]].apply(pd.to_numeric, errors='coerce')
+    weights = values.iloc[:, WEIGHT_POSITION - 1]
+    present = values.notna()
+
+    grouped_sum = values.groupby(groups, sort=False).sum(min_count=1)
+    weighted_sum = values.mul(weights, axis=0).groupby(groups, sort=False).sum(min_count=1)
+    weight_sum = present.mul(weights, axis=0).groupby(groups, sort=False).sum()
+    count = present.groupby(groups, sort=False).sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weighted = weighted_sum / weight_sum
+        unweighted = grouped_sum / count
+    aggregated = weighted.where(np.isfinite(weighted), unweighted)
+
+    for position in COUNT_POSITIONS:
+        if position < len(columns):
+            aggregated[columns[position]] = grouped_sum[columns[position]]
+
+    return aggregated.reset_index()[list(columns)]
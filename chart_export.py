@@ -0,0 +1,61 @@
+import io
+import json
+import zipfile
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from derived_metrics import compute_derived_metrics
+from sheet_statistics import compute_sheet_statistics
+
+# PNG output is already compressed, so chart images are stored as-is in the zip
+PNG_COMPRESSION = zipfile.ZIP_STORED
+TEXT_COMPRESSION = zipfile.ZIP_DEFLATED
+
+def chart_filename(name, chart_name, extension):
+    """Build a file-system friendly name for a chart inside the bundle"""
+    return f"{name}_{chart_name.replace(' ', '_')}.{extension}"
+
+def render_chart_png(chart_function, df, name, stats=None, derived=None, dpi=120):
+    """Render a single chart to PNG bytes in memory and return them with its insights"""
+    fig, insights = chart_function(df, name, stats, derived)
+    buffer = io.BytesIO()
+    try:
+        fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return buffer.getvalue(), insights
+
+def build_chart_bundle(df, name, chart_functions, recommendations, dpi=120):
+    """Render charts into an in-memory zip with the underlying data and recommendations.
+
+    Only one figure is alive at a time: each chart is rendered, written straight
+    into its zip entry and closed before the next one starts, so peak memory stays
+    bounded by a single figure plus the compressed archive.
+    """
+    buffer = io.BytesIO()
+    insights = {}
+    stats = compute_sheet_statistics(df)
+    derived = compute_derived_metrics(df)
+
+    with zipfile.ZipFile(buffer, 'w') as bundle:
+        for chart_name, chart_function in chart_functions.items():
+            fig, auto_insights = chart_function(df, name, stats, derived)
+            entry_info = zipfile.ZipInfo(chart_filename(name, chart_name, 'png'))
+            entry_info.compress_type = PNG_COMPRESSION
+            try:
+                with bundle.open(entry_info, 'w') as entry:
+                    fig.savefig(entry, format='png', dpi=dpi, bbox_inches='tight')
+            finally:
+                plt.close(fig)
+
+            # Fall back to the generated insights for charts without a saved recommendation
+            key = f"{name}_{chart_name}_recommendation"
+            insights[key] = recommendations.get(key) or auto_insights
+
+        # The data export carries the derived metrics next to the source columns
+        data = pd.concat([df, derived], axis=1)
+        bundle.writestr(f"{name}_data.csv", data.to_csv(index=False), compress_type=TEXT_COMPRESSION)
+        bundle.writestr(f"{name}_recommendations.json", json.dumps(insights, indent=4),
+                        compress_type=TEXT_COMPRESSION)
+
+    return buffer.getvalue()
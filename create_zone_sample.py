@@ -2,37 +2,12 @@ import pandas as pd
 import numpy as np
 import os
 
-def create_sample_zone_data():
+def generate_zone_frame(zones, column_names, seed=None):
     """
-    Create a sample Zone sheet for the Aadhar data Excel file.
-    This generates realistic-looking zone data based on the structure of the other sheets.
+    Generate realistic-looking sheet data for the given category labels.
+    The frame has the same columns as the other sheets; pass a seed for reproducible data.
     """
-    print("Creating sample Zone sheet for Aadhar data...")
-    
-    # Check if the Excel file exists
-    if not os.path.exists('Aadhar_modified.xlsx'):
-        print("Error: Aadhar_modified.xlsx not found!")
-        return
-    
-    # Try to read the other sheets to understand the structure
-    try:
-        gender_df = pd.read_excel('Aadhar_modified.xlsx', sheet_name='Gender')
-        column_names = gender_df.columns
-    except Exception as e:
-        print(f"Error reading existing sheets: {str(e)}")
-        return
-        
-    # Define zone names (using Indian regions)
-    zones = [
-        'Delhi', 'Mumbai', 'Kolkata', 'Chennai', 'Bengaluru', 
-        'Hyderabad', 'Ahmedabad', 'Pune', 'Jaipur', 'Lucknow',
-        'Kanpur', 'Nagpur', 'Patna', 'Indore', 'Thane', 
-        'Bhopal', 'Visakhapatnam', 'Vadodara', 'Ghaziabad', 'Ludhiana',
-        'Agra', 'Nashik', 'Ranchi', 'Faridabad', 'Guwahati',
-        'Chandigarh', 'Thiruvananthapuram', 'Dehradun', 'Jammu'
-    ]
-    
-    # Create the Zone dataframe with the same structure as Gender
+    rng = np.random.default_rng(seed)
     zone_df = pd.DataFrame(columns=column_names)
     zone_df['Category'] = zones
     
@@ -41,7 +16,7 @@ def create_sample_zone_data():
         """Generate n data points correlated with a base value"""
         base_value = base
         # Generate values with some correlation to base_value
-        values = np.random.normal(base_value, variance, n)
+        values = rng.normal(base_value, variance, n)
         # Apply correlation
         correlated = base_value * correlation + values * (1-correlation)
         # Apply min/max constraints
@@ -55,45 +30,80 @@ def create_sample_zone_data():
     n_zones = len(zones)
     
     # Column 1: Cohort data (assuming this is count data)
-    cohort_base = np.random.randint(300, 800)
+    cohort_base = rng.integers(300, 800)
     zone_df[column_names[1]] = generate_correlated_data(n_zones, cohort_base, cohort_base/5, min_val=100).astype(int)
     
     # Column 2: Another cohort data column
-    cohort2_base = np.random.randint(200, 400)
+    cohort2_base = rng.integers(200, 400)
     zone_df[column_names[2]] = generate_correlated_data(n_zones, cohort2_base, cohort2_base/5, min_val=50).astype(int)
     
     # Generate KPI achievement percentages
-    kpi_base = np.random.uniform(85, 110)
+    kpi_base = rng.uniform(85, 110)
     zone_df[column_names[3]] = generate_correlated_data(n_zones, kpi_base, 15, min_val=70, max_val=130)
     zone_df[column_names[7]] = generate_correlated_data(n_zones, kpi_base, 15, min_val=70, max_val=130)
     
     # Top and bottom performers
-    zone_df[column_names[4]] = generate_correlated_data(n_zones, np.random.randint(30, 50), 10, min_val=20, max_val=70)
-    zone_df[column_names[5]] = generate_correlated_data(n_zones, np.random.randint(10, 20), 5, min_val=5, max_val=35)
-    zone_df[column_names[8]] = generate_correlated_data(n_zones, np.random.randint(30, 50), 10, min_val=20, max_val=70)
-    zone_df[column_names[9]] = generate_correlated_data(n_zones, np.random.randint(10, 20), 5, min_val=5, max_val=35)
+    zone_df[column_names[4]] = generate_correlated_data(n_zones, rng.integers(30, 50), 10, min_val=20, max_val=70)
+    zone_df[column_names[5]] = generate_correlated_data(n_zones, rng.integers(10, 20), 5, min_val=5, max_val=35)
+    zone_df[column_names[8]] = generate_correlated_data(n_zones, rng.integers(30, 50), 10, min_val=20, max_val=70)
+    zone_df[column_names[9]] = generate_correlated_data(n_zones, rng.integers(10, 20), 5, min_val=5, max_val=35)
     
     # Performance multiples
-    zone_df[column_names[6]] = generate_correlated_data(n_zones, np.random.uniform(1.5, 3), 0.5, min_val=1.0, max_val=4.0)
-    zone_df[column_names[10]] = generate_correlated_data(n_zones, np.random.uniform(1.5, 3), 0.5, min_val=1.0, max_val=4.0)
+    zone_df[column_names[6]] = generate_correlated_data(n_zones, rng.uniform(1.5, 3), 0.5, min_val=1.0, max_val=4.0)
+    zone_df[column_names[10]] = generate_correlated_data(n_zones, rng.uniform(1.5, 3), 0.5, min_val=1.0, max_val=4.0)
     
     # Time to first sale
-    zone_df[column_names[11]] = generate_correlated_data(n_zones, np.random.uniform(1.5, 3), 0.7, min_val=0.5, max_val=6)
+    zone_df[column_names[11]] = generate_correlated_data(n_zones, rng.uniform(1.5, 3), 0.7, min_val=0.5, max_val=6)
     
     # CAR2CATPO Ratio
-    zone_df[column_names[12]] = generate_correlated_data(n_zones, np.random.uniform(1.2, 2.5), 0.4, min_val=0.5, max_val=3.5)
+    zone_df[column_names[12]] = generate_correlated_data(n_zones, rng.uniform(1.2, 2.5), 0.4, min_val=0.5, max_val=3.5)
     
     # Attrition numbers
-    attrition_base = np.random.randint(20, 40)
+    attrition_base = rng.integers(20, 40)
     zone_df[column_names[13]] = generate_correlated_data(n_zones, attrition_base, attrition_base/3, min_val=5).astype(int)
     
     # Average residency
-    residency_base = np.random.uniform(15, 24)
+    residency_base = rng.uniform(15, 24)
     zone_df[column_names[14]] = generate_correlated_data(n_zones, residency_base, 4, min_val=6)
     zone_df[column_names[15]] = generate_correlated_data(n_zones, residency_base*1.2, 5, min_val=8)  # Top performers stay longer
     
     # Infant attrition
-    zone_df[column_names[16]] = generate_correlated_data(n_zones, np.random.uniform(0.15, 0.25), 0.07, min_val=0.05, max_val=0.45)
+    zone_df[column_names[16]] = generate_correlated_data(n_zones, rng.uniform(0.15, 0.25), 0.07, min_val=0.05, max_val=0.45)
+    
+    return zone_df
+
+def create_sample_zone_data():
+    """
+    Create a sample Zone sheet for the Aadhar data Excel file.
+    This generates realistic-looking zone data based on the structure of the other sheets.
+    """
+    print("Creating sample Zone sheet for Aadhar data...")
+    
+    # Check if the Excel file exists
+    if not os.path.exists('Aadhar_modified.xlsx'):
+        print("Error: Aadhar_modified.xlsx not found!")
+        return
+    
+    # Try to read the other sheets to understand the structure
+    try:
+        gender_df = pd.read_excel('Aadhar_modified.xlsx', sheet_name='Gender')
+        column_names = gender_df.columns
+    except Exception as e:
+        print(f"Error reading existing sheets: {str(e)}")
+        return
+        
+    # Define zone names (using Indian regions)
+    zones = [
+        'Delhi', 'Mumbai', 'Kolkata', 'Chennai', 'Bengaluru', 
+        'Hyderabad', 'Ahmedabad', 'Pune', 'Jaipur', 'Lucknow',
+        'Kanpur', 'Nagpur', 'Patna', 'Indore', 'Thane', 
+        'Bhopal', 'Visakhapatnam', 'Vadodara', 'Ghaziabad', 'Ludhiana',
+        'Agra', 'Nashik', 'Ranchi', 'Faridabad', 'Guwahati',
+        'Chandigarh', 'Thiruvananthapuram', 'Dehradun', 'Jammu'
+    ]
+    
+    # Create the Zone dataframe with the same structure as Gender
+    zone_df = generate_zone_frame(zones, column_names)
     
     # Read the existing Excel file
     try:
@@ -15,6 +15,7 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import io
 import os
 from hdfc_viz import plot_bar_chart, COLOR_SCHEMES, BG_STYLES
 
@@ -73,11 +74,49 @@ This interactive dashboard allows you to explore HDFC data with customizable vis
 Use the sidebar options to configure your charts and analyze different aspects of the data.
 """)
 
-# Function to load data
+# Function to load data, cached per file version (modification time) so an edited workbook is re-read
 @st.cache_data
-def load_data(file_path, sheet_name):
+def load_data(file_path, sheet_name, version):
     return pd.read_excel(file_path, sheet_name=sheet_name, index_col="Category")
 
+# Correlation matrix of every numeric column, computed once per file version (modification time)
+@st.cache_data
+def correlation_matrix(file_path, sheet_name, version):
+    numeric = load_data(file_path, sheet_name, version).select_dtypes('number').dropna(axis=1, how='all')
+    values = numeric.to_numpy(dtype=float)
+    present = (~np.isnan(values)).astype(float)
+    values = np.nan_to_num(values)
+    
+    # Pearson correlation over the rows where both columns have a value, for all pairs at once
+    counts = present.T @ present
+    sums = values.T @ present  # sums[i, j]: sum of column i where column j is present
+    squares = (values ** 2).T @ present
+    products = values.T @ values
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = products - sums * sums.T / counts
+        variance = squares - sums ** 2 / counts
+        matrix = covariance / np.sqrt(variance * variance.T)
+    matrix[counts < 2] = np.nan
+    return pd.DataFrame(np.clip(matrix, -1, 1), index=numeric.columns, columns=numeric.columns)
+
+# Heatmap of the correlation matrix, rendered once per file version
+@st.cache_data
+def correlation_heatmap(file_path, sheet_name, version):
+    matrix = correlation_matrix(file_path, sheet_name, version)
+    labels = [col if len(col) <= 30 else col[:29] + '…' for col in matrix.columns]
+    
+    fig, ax = plt.subplots(figsize=(14, 11))
+    sns.heatmap(matrix, cmap="RdBu_r", vmin=-1, vmax=1, center=0, annot=True, fmt=".2f",
+                annot_kws={"size": 7}, xticklabels=labels, yticklabels=labels, square=True, ax=ax)
+    ax.set_title("Correlation Matrix")
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right', fontsize=8)
+    plt.setp(ax.get_yticklabels(), fontsize=8)
+    
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight', dpi=110)
+    plt.close(fig)
+    return buf.getvalue()
+
 # Sidebar for controls
 st.sidebar.header("Dashboard Controls")
 
@@ -99,7 +138,8 @@ try:
     )
     
     # Load the data
-    data = load_data(excel_file, selected_sheet)
+    data_version = os.path.getmtime(excel_file)
+    data = load_data(excel_file, selected_sheet, data_version)
       # Show data overview
     with st.expander("Data Overview", expanded=False):
         st.dataframe(data, use_container_width=True)  # Use full container width
@@ -420,18 +460,36 @@ try:
     with st.expander("Statistical Summary"):
         st.dataframe(data.describe(), use_container_width=True)  # Use full width
     
-    # Compare columns
-    if len(selected_columns) >= 2:
+    # Compare columns using the precomputed correlation matrix of the whole sheet
+    matrix = correlation_matrix(excel_file, selected_sheet, data_version)
+    if len(matrix.columns) >= 2:
         with st.expander("Column Comparison"):
-            # Select columns to compare
+            st.image(correlation_heatmap(excel_file, selected_sheet, data_version), use_container_width=True)
+            
+            # Strongest pairs first, read from the upper triangle of the matrix
+            rows, cols = np.triu_indices(len(matrix.columns), k=1)
+            pairs = pd.DataFrame({
+                "First column": matrix.columns[rows],
+                "Second column": matrix.columns[cols],
+                "Correlation": matrix.to_numpy()[rows, cols]
+            }).dropna()
+            pairs = pairs.iloc[np.argsort(-pairs["Correlation"].abs().to_numpy(), kind='stable')]
+            st.markdown("**Strongest correlations**")
+            st.dataframe(pairs.head(10), hide_index=True, use_container_width=True)
+            
+            # Drill down into one pair
+            compare_options = matrix.columns.tolist()
+            default_pair = [col for col in selected_columns if col in compare_options][:2]
+            if len(default_pair) < 2:
+                default_pair = compare_options[:2]
             col1, col2 = st.columns(2)
             with col1:
-                compare_col1 = st.selectbox("Select first column", selected_columns, index=0)
+                compare_col1 = st.selectbox("Select first column", compare_options, index=compare_options.index(default_pair[0]))
             with col2:
-                compare_col2 = st.selectbox("Select second column", selected_columns, index=min(1, len(selected_columns)-1))
+                compare_col2 = st.selectbox("Select second column", compare_options, index=compare_options.index(default_pair[1]))
             
-            # Calculate correlation
-            correlation = data[compare_col1].corr(data[compare_col2])
+            # Look up the correlation
+            correlation = matrix.loc[compare_col1, compare_col2]
             st.metric("Correlation", f"{correlation:.4f}")
               # Plot comparison
             fig, ax = plt.subplots(figsize=(14, 8))  # Larger figure size
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from aadhar_data import METRIC_NAMES
+
+# Derived columns, named for display and export
+COHORT_SHARE_LRM = 'CAP LRM Cohort Share %'
+COHORT_SHARE_12 = 'CAP 12 Cohort Share %'
+COMBINED_KPI_PCT = 'Combined KPI Achievement %'
+KPI1_PCT = 'KPI 1 Achievement %'
+COMBINED_PERFORMANCE_GAP = 'Combined KPI Top-Bottom Gap'
+KPI1_PERFORMANCE_GAP = 'KPI 1 Top-Bottom Gap'
+ATTRITION_RATE = 'Attrition Rate %'
+RESIDENCY_PCT_DIFF = 'Top 100 vs All Residency Diff %'
+INFANT_ATTRITION_PCT = 'Infant Attrition %'
+
+# Sheet column of infant attrition, after the Category column; the sheets have unnamed columns after it
+INFANT_ATTRITION_POSITION = METRIC_NAMES.index('Infant Attrition') + 1
+
+def compute_derived_metrics(df):
+    """
+    Compute every derived metric of a sheet as vectorized numpy columns.
+
+    Source columns are picked by position, exactly as the chart functions pick
+    them, and the result shares the sheet's index. Derived columns whose source
+    columns are missing from the sheet are left out.
+    """
+    columns = df.columns
+    derived = {}
+
+    def column(position):
+        return df[columns[position]].to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Each category's share of the cohort head count (distribution chart)
+        if len(columns) > 2:
+            for position, label in [(1, COHORT_SHARE_LRM), (2, COHORT_SHARE_12)]:
+                counts = column(position)
+                derived[label] = counts / np.nansum(counts) * 100
+
+        # KPI achievement is stored as a fraction; convert it to percentages
+        if len(columns) > 7:
+            derived[COMBINED_KPI_PCT] = column(3) * 100
+            derived[KPI1_PCT] = column(7) * 100
+
+        # Gap between the top and bottom 10% performers
+        if len(columns) > 9:
+            derived[COMBINED_PERFORMANCE_GAP] = column(4) - column(5)
+            derived[KPI1_PERFORMANCE_GAP] = column(8) - column(9)
+
+        # Attrited employees of the LRM cohort relative to the cohort's head count
+        if len(columns) > 13:
+            derived[ATTRITION_RATE] = column(13) / column(1) * 100
+
+        # How much longer (or shorter) the Top 100 performers stay than all employees
+        if len(columns) > 15:
+            all_residency = column(14)
+            top_residency = column(15)
+            derived[RESIDENCY_PCT_DIFF] = np.where(
+                all_residency > 0, (top_residency - all_residency) / all_residency * 100, 0
+            )
+
+        # Infant attrition is converted to a percentage
+        if len(columns) > INFANT_ATTRITION_POSITION:
+            derived[INFANT_ATTRITION_PCT] = column(INFANT_ATTRITION_POSITION) * 100
+
+    return pd.DataFrame(derived, index=df.index)
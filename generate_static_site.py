@@ -0,0 +1,187 @@
+"""
+Aadhar Static Dashboard Generator
+---------------------------------
+Pre-renders every category x chart combination, together with its insights and
+saved recommendations, into a static HTML bundle that any plain file server can
+host with no computation per view.
+
+Usage:
+    python generate_static_site.py [--output site] [--force]
+
+The bundle is only rebuilt when the workbook or the saved recommendations change
+(or when --force is given).
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import shutil
+from datetime import datetime
+import matplotlib.pyplot as plt
+
+from aadhar_data import WORKBOOK_FILE, load_category_sheets, files_fingerprint
+from chart_export import chart_filename
+from recommendation_backends import open_backend
+from derived_metrics import compute_derived_metrics
+from sheet_statistics import compute_sheet_statistics
+from streamlit_dashboard_simple import CHART_FUNCTIONS
+
+# Bump when the page layout changes so existing bundles are regenerated
+SITE_VERSION = 1
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+    body {{ font-family: Arial, sans-serif; background-color: #f8f9fa; margin: 0; padding: 20px 40px; color: #333; }}
+    h1 {{ text-align: center; font-weight: 800; color: #0047AB; }}
+    nav {{ text-align: center; margin-bottom: 30px; }}
+    nav a {{ margin: 0 12px; color: #0A2472; font-weight: 700; text-decoration: none; }}
+    nav a.active {{ border-bottom: 3px solid #0047AB; }}
+    .grid {{ display: grid; grid-template-columns: repeat(auto-fill, minmax(480px, 1fr)); gap: 20px; }}
+    .card {{ background: #fff; border: 1px solid #e0e0e0; border-radius: 10px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+    .card h2 {{ text-align: center; color: #0A2472; background-color: #f0f2f6; padding: 15px; margin: 0; border-bottom: 2px solid #e0e0e0; }}
+    .card img {{ width: 100%; height: auto; aspect-ratio: 3 / 2; object-fit: contain; display: block; }}
+    .insights {{ padding: 10px 15px; background-color: #f8f9fa; border-top: 1px solid #e0e0e0; font-size: 14px; }}
+    footer {{ text-align: center; color: #777; font-size: 12px; margin-top: 30px; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<nav>{navigation}</nav>
+{content}
+<footer>Generated {generated}</footer>
+</body>
+</html>
+"""
+
+CARD_TEMPLATE = """<div class="card">
+    <h2>{chart_name}</h2>
+    <img src="images/{image}" alt="{chart_name} by {name}" loading="lazy" decoding="async">
+    <div class="insights"><strong>Key Insights:</strong><br>{insights}</div>
+</div>"""
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the static Aadhar dashboard site.")
+    parser.add_argument('--output', default='site', help="Directory to write the site into")
+    parser.add_argument('--force', action='store_true', help="Rebuild even if the inputs are unchanged")
+    args = parser.parse_args()
+
+    print("Aadhar Static Dashboard Generator")
+    print("---------------------------------")
+
+    # The recommendations live in a database, so hash their content rather than a file
+    recommendations = read_recommendations()
+    fingerprint = hashlib.sha256(
+        (files_fingerprint(WORKBOOK_FILE) + json.dumps(recommendations, sort_keys=True)).encode('utf-8')
+    ).hexdigest()
+    manifest_path = os.path.join(args.output, 'manifest.json')
+
+    # Skip the whole pipeline if neither the workbook nor the recommendations changed
+    if not args.force and os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        if manifest.get('fingerprint') == fingerprint and manifest.get('site_version') == SITE_VERSION:
+            print(f"Site in '{args.output}' is up to date; nothing to do.")
+            return
+
+    print(f"Loading data from {WORKBOOK_FILE}...")
+    try:
+        sheets = load_category_sheets()
+    except Exception as e:
+        print(f"Error loading data: {str(e)}")
+        return
+
+    generate_site(sheets, recommendations, args.output)
+
+    with open(manifest_path, 'w') as f:
+        json.dump({
+            'fingerprint': fingerprint,
+            'site_version': SITE_VERSION,
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'categories': list(sheets)
+        }, f, indent=4)
+    print(f"\nSite written to '{args.output}'. Open {os.path.join(args.output, 'index.html')} or serve the folder.")
+
+def read_recommendations():
+    """Return the shared recommendations, read straight from the configured store"""
+    try:
+        store = open_backend()
+        try:
+            return store.load_all()
+        finally:
+            store.close()
+    except Exception as e:
+        print(f"Could not load recommendations: {str(e)}")
+        return {}
+
+def generate_site(sheets, recommendations, output_dir):
+    """Render every chart of every category and write one HTML page per category."""
+    images_dir = os.path.join(output_dir, 'images')
+
+    # Start from an empty image folder so charts that no longer exist are not left behind
+    if os.path.exists(images_dir):
+        shutil.rmtree(images_dir)
+    os.makedirs(images_dir)
+
+    generated = datetime.now().strftime("%Y-%m-%d %H:%M")
+    names = list(sheets)
+
+    for name, df in sheets.items():
+        print(f"\nGenerating pages for {name}...")
+        cards = []
+        stats = compute_sheet_statistics(df)
+        derived = compute_derived_metrics(df)
+        for chart_name, chart_function in CHART_FUNCTIONS.items():
+            print(f"  Rendering {chart_name} chart...")
+            image = chart_filename(name, chart_name, 'png')
+            try:
+                fig, auto_insights = chart_function(df, name, stats, derived)
+                fig.savefig(os.path.join(images_dir, image), format='png', dpi=120, bbox_inches='tight')
+                plt.close(fig)
+            except Exception as e:
+                print(f"  Error generating {chart_name} chart: {str(e)}")
+                continue
+
+            # Saved recommendations take precedence over the generated insights, as in the dashboard
+            insights = recommendations.get(f"{name}_{chart_name}_recommendation") or auto_insights
+            cards.append(CARD_TEMPLATE.format(
+                chart_name=html.escape(chart_name),
+                name=html.escape(name),
+                image=image,
+                insights=html.escape(insights).replace('\n', '<br>')
+            ))
+
+        write_page(os.path.join(output_dir, page_filename(name)), f"{name} Analysis Dashboard",
+                   navigation(names, name), f'<div class="grid">\n{"".join(cards)}\n</div>', generated)
+
+    links = "".join(f'<li><a href="{page_filename(name)}">{html.escape(name)} Analysis Dashboard</a></li>'
+                    for name in names)
+    write_page(os.path.join(output_dir, 'index.html'), "Aadhar Analysis Dashboard",
+               navigation(names), f"<ul>{links}</ul>", generated)
+
+def page_filename(name):
+    """HTML file name for a category page"""
+    return f"{name.lower()}.html"
+
+def navigation(names, active=None):
+    """Build the category navigation bar shared by every page"""
+    links = []
+    for name in names:
+        css_class = ' class="active"' if name == active else ''
+        links.append(f'<a href="{page_filename(name)}"{css_class}>{html.escape(name)}</a>')
+    return "".join(links)
+
+def write_page(path, title, navigation_html, content, generated):
+    """Write one HTML page of the static site"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(PAGE_TEMPLATE.format(title=html.escape(title), navigation=navigation_html,
+                                     content=content, generated=generated))
+
+if __name__ == "__main__":
+    main()
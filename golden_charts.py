@@ -0,0 +1,168 @@
+"""
+Aadhar Golden-Image Chart Harness
+---------------------------------
+Renders every dashboard chart for fixed, seeded datasets and compares the result
+with stored golden images using an RMS pixel tolerance, recording render time
+alongside. A performance refactor of the chart code is acceptable when it is
+faster and still matches the golden images.
+
+Usage:
+    python golden_charts.py --update       # (re)create the golden images from the current code
+    python golden_charts.py                # compare against the golden images
+    python golden_charts.py --tolerance 5
+
+Failing charts are written to golden/failures/ together with a diff image, and
+the timings of every run are written to golden/last_run.json. The script exits
+with status 1 when any chart no longer matches its golden image.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import warnings
+from datetime import datetime
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from aadhar_data import WORKBOOK_FILE
+from chart_export import chart_filename, render_chart_png
+from create_zone_sample import generate_zone_frame
+from streamlit_dashboard_simple import CHART_FUNCTIONS
+
+GOLDEN_DIR = 'golden'
+FAILURES_DIR = os.path.join(GOLDEN_DIR, 'failures')
+MANIFEST_FILE = os.path.join(GOLDEN_DIR, 'manifest.json')
+LAST_RUN_FILE = os.path.join(GOLDEN_DIR, 'last_run.json')
+
+# Seed of the synthetic golden datasets; changing it invalidates every golden image
+GOLDEN_SEED = 2024
+
+# Category labels of the golden datasets, mirroring the real sheets so that the
+# category-specific branches (Female highlight, rotated Education labels) are covered
+GOLDEN_CATEGORIES = {
+    'Gender': ['Male', 'Female'],
+    'Education': ['B.A', 'B.Com', 'HSC', 'B.Sc', 'M.B.A', 'Others', 'Diploma', 'SSC'],
+    'Experience': ['0-6 Months', '06-12 Months', '12-24 Months', '24-36 Months', '36-346 Months'],
+    'Age': ['20-22', '22-25', '25-28', '28-30', '30-35', '35-52'],
+    'Zone': ['Delhi', 'Mumbai', 'Kolkata', 'Chennai', 'Bengaluru', 'Hyderabad', 'Pune', 'Jaipur']
+}
+
+# Root-mean-square pixel difference (0-255 scale) tolerated before a chart counts as changed
+DEFAULT_TOLERANCE = 2.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dashboard charts against golden images.")
+    parser.add_argument('--update', action='store_true', help="Store the current renders as the golden images")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed RMS pixel difference on a 0-255 scale")
+    args = parser.parse_args()
+
+    # Chart functions emit layout warnings on every call; they only add noise here
+    warnings.filterwarnings('ignore')
+
+    print("Aadhar Golden-Image Chart Harness")
+    print("---------------------------------")
+
+    manifest = {}
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, 'r') as f:
+            manifest = json.load(f)
+    elif not args.update:
+        print(f"No golden images found in '{GOLDEN_DIR}'; run with --update to create them.")
+        return 1
+
+    os.makedirs(GOLDEN_DIR, exist_ok=True)
+    results = []
+    for name, df in golden_datasets().items():
+        print(f"\nRendering {name} charts...")
+        for chart_name, chart_function in CHART_FUNCTIONS.items():
+            image = chart_filename(name, chart_name, 'png')
+            start = time.perf_counter()
+            png, _ = render_chart_png(chart_function, df, name)
+            render_time = round(time.perf_counter() - start, 4)
+
+            result = {'category': name, 'chart': chart_name, 'image': image, 'render_time_s': render_time}
+            if args.update:
+                with open(os.path.join(GOLDEN_DIR, image), 'wb') as f:
+                    f.write(png)
+                print(f"  {chart_name:<26} {render_time:7.3f}s  stored")
+            else:
+                result.update(compare_with_golden(png, image, args.tolerance))
+                golden_time = manifest.get('render_times', {}).get(image)
+                result['golden_render_time_s'] = golden_time
+                speed = f" (golden {golden_time:.3f}s)" if golden_time else ""
+                status = "ok" if result['passed'] else f"CHANGED (rms {result['rms']})"
+                print(f"  {chart_name:<26} {render_time:7.3f}s{speed}  {status}")
+            results.append(result)
+
+    if args.update:
+        with open(MANIFEST_FILE, 'w') as f:
+            json.dump({
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'seed': GOLDEN_SEED,
+                'render_times': {r['image']: r['render_time_s'] for r in results}
+            }, f, indent=4)
+        print(f"\nStored {len(results)} golden images in '{GOLDEN_DIR}'.")
+        return 0
+
+    with open(LAST_RUN_FILE, 'w') as f:
+        json.dump({'created': datetime.now().isoformat(timespec='seconds'),
+                   'tolerance': args.tolerance, 'results': results}, f, indent=4)
+
+    failures = [r for r in results if not r['passed']]
+    total_time = sum(r['render_time_s'] for r in results)
+    golden_total = sum(manifest.get('render_times', {}).values())
+    print(f"\nTotal render time {total_time:.2f}s (golden {golden_total:.2f}s).")
+    if failures:
+        print(f"{len(failures)} chart(s) differ from their golden image; see '{FAILURES_DIR}'.")
+        return 1
+    print("All charts match their golden images.")
+    return 0
+
+def golden_datasets():
+    """Build the fixed, seeded dataset for every golden category"""
+    column_names = pd.read_excel(WORKBOOK_FILE, sheet_name='Gender', nrows=0).columns
+    return {name: generate_zone_frame(labels, column_names, seed=GOLDEN_SEED)
+            for name, labels in GOLDEN_CATEGORIES.items()}
+
+def compare_with_golden(png, image, tolerance):
+    """Compare rendered PNG bytes with the stored golden image"""
+    golden_path = os.path.join(GOLDEN_DIR, image)
+    if not os.path.exists(golden_path):
+        return {'passed': False, 'rms': None, 'reason': 'missing golden image'}
+
+    actual = load_pixels(io.BytesIO(png))
+    expected = load_pixels(golden_path)
+    if actual.shape != expected.shape:
+        save_failure(image, png)
+        return {'passed': False, 'rms': None,
+                'reason': f"size changed from {expected.shape[1]}x{expected.shape[0]} "
+                          f"to {actual.shape[1]}x{actual.shape[0]}"}
+
+    difference = np.abs(actual - expected)
+    rms = float(np.sqrt(np.mean(np.square(difference))))
+    passed = rms <= tolerance
+    if not passed:
+        save_failure(image, png, difference)
+    return {'passed': passed, 'rms': round(rms, 3)}
+
+def load_pixels(source):
+    """Load a PNG as an RGB array on a 0-255 scale"""
+    pixels = plt.imread(source, format='png')[..., :3]
+    return pixels.astype(np.float64) * 255
+
+def save_failure(image, png, difference=None):
+    """Keep the failing render (and an amplified diff image) for inspection"""
+    os.makedirs(FAILURES_DIR, exist_ok=True)
+    with open(os.path.join(FAILURES_DIR, image), 'wb') as f:
+        f.write(png)
+    if difference is not None:
+        diff_image = np.clip(difference * 10, 0, 255).astype(np.uint8)
+        plt.imsave(os.path.join(FAILURES_DIR, image.replace('.png', '_diff.png')), diff_image)
+
+if __name__ == "__main__":
+    sys.exit(main())
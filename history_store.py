@@ -0,0 +1,127 @@
+"""
+Aadhar Snapshot History Store
+-----------------------------
+Append-only columnar store of monthly workbook snapshots. Each workbook is
+ingested once into Parquet files partitioned by snapshot date and category
+sheet, with one column per metric, so trend queries read only the columns and
+partitions they need instead of re-opening old Excel files.
+
+Usage:
+    python history_store.py ingest Aadhar_modified.xlsx --date 2025-05-01
+    python history_store.py ingest old/Aadhar_2025_04.xlsx --date 2025-04-01
+    python history_store.py list
+
+Layout:
+    history/snapshot_date=2025-05-01/dimension=Gender/part-0.parquet
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from aadhar_data import WORKBOOK_FILE, METRIC_NAMES, load_category_sheets
+
+HISTORY_DIR = 'history'
+
+# Partition columns, outermost first
+SNAPSHOT_DATE = 'snapshot_date'
+DIMENSION = 'dimension'
+CATEGORY = 'category'
+
+PARTITIONING = ds.partitioning(
+    pa.schema([(SNAPSHOT_DATE, pa.string()), (DIMENSION, pa.string())]), flavor='hive'
+)
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the Aadhar snapshot history store.")
+    parser.add_argument('--root', default=HISTORY_DIR, help="Directory holding the history store")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help="Add one workbook snapshot to the store")
+    ingest.add_argument('workbook', nargs='?', default=WORKBOOK_FILE, help="Workbook to ingest")
+    ingest.add_argument('--date', default=date.today().isoformat(),
+                        help="Snapshot date as YYYY-MM-DD (default: today)")
+
+    commands.add_parser('list', help="List the snapshots in the store")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        snapshots = list_snapshots(args.root)
+        if not snapshots:
+            print(f"No snapshots stored in '{args.root}'.")
+        for snapshot_date in snapshots:
+            print(snapshot_date)
+        return 0
+
+    try:
+        snapshot_date = date.fromisoformat(args.date).isoformat()
+    except ValueError:
+        print(f"Error: '{args.date}' is not a YYYY-MM-DD date")
+        return 1
+    if snapshot_date in list_snapshots(args.root):
+        print(f"Snapshot {snapshot_date} is already stored; the history is append-only.")
+        return 1
+    if not os.path.exists(args.workbook):
+        print(f"Error: {args.workbook} not found!")
+        return 1
+
+    rows = ingest_snapshot(args.workbook, snapshot_date, args.root)
+    print(f"Stored snapshot {snapshot_date} from {args.workbook} ({rows} category rows).")
+    return 0
+
+def snapshot_frame(sheets):
+    """Combine the category sheets of one workbook into one frame with a column per metric"""
+    frames = []
+    for dimension, df in sheets.items():
+        metrics = df.iloc[:, 1:len(METRIC_NAMES) + 1].apply(pd.to_numeric, errors='coerce')
+        metrics.columns = METRIC_NAMES[:metrics.shape[1]]
+        frames.append(metrics.assign(**{CATEGORY: df['Category'].astype(str), DIMENSION: dimension}))
+
+    # Sheets with fewer metric columns leave the missing metrics empty
+    combined = pd.concat(frames, ignore_index=True)
+    return combined.reindex(columns=[DIMENSION, CATEGORY] + METRIC_NAMES).astype({name: float for name in METRIC_NAMES})
+
+def ingest_snapshot(workbook, snapshot_date, root=HISTORY_DIR):
+    """Write one workbook into the store under the given snapshot date; returns the row count"""
+    frame = snapshot_frame(load_category_sheets(workbook)).assign(**{SNAPSHOT_DATE: snapshot_date})
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    ds.write_dataset(
+        table, root, format='parquet', partitioning=PARTITIONING,
+        basename_template='part-{i}.parquet',
+        existing_data_behavior='overwrite_or_ignore'
+    )
+    return len(frame)
+
+def list_snapshots(root=HISTORY_DIR):
+    """Return the stored snapshot dates, oldest first, from the partition directories"""
+    if not os.path.isdir(root):
+        return []
+    prefix = f"{SNAPSHOT_DATE}="
+    return sorted(entry[len(prefix):] for entry in os.listdir(root) if entry.startswith(prefix))
+
+def load_trend(metric, dimension, categories=None, root=HISTORY_DIR):
+    """
+    Return one metric of one category sheet across all snapshots.
+
+    Only the category column, the metric column and the partitions of the requested
+    sheet are read. The result has one row per snapshot date and one column per category.
+    """
+    if not list_snapshots(root):
+        return pd.DataFrame()
+
+    dataset = ds.dataset(root, format='parquet', partitioning=PARTITIONING)
+    condition = ds.field(DIMENSION) == dimension
+    if categories:
+        condition = condition & ds.field(CATEGORY).isin(list(categories))
+    table = dataset.to_table(columns=[SNAPSHOT_DATE, CATEGORY, metric], filter=condition)
+
+    trend = table.to_pandas().pivot_table(index=SNAPSHOT_DATE, columns=CATEGORY, values=metric, dropna=False)
+    trend.index = pd.to_datetime(trend.index)
+    return trend.sort_index()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,318 @@
+import hashlib
+import string
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+from sheet_statistics import compute_sheet_statistics, COHORT_TOTAL
+from derived_metrics import INFANT_ATTRITION_POSITION
+
+# Insight text of every chart, as format templates keyed by chart name and fragment.
+# An insight is the concatenation of the fragments chosen by the chart's builder below;
+# "note:<category>" fragments add the category-specific recommendation.
+INSIGHT_TEMPLATES = {
+    'Distribution': {
+        'gender': "The gender distribution shows a male-to-female ratio of {ratio:.2f}:1. "
+                  "The {top_category} category shows the highest representation at {top_pct:.1f}% for {top_metric}.",
+        'gender_incomplete': "The {name} distribution shows that {top_category} has the highest representation "
+                             "at {top_pct:.1f}% for {top_metric}.",
+        'summary': "The {name} distribution analysis shows that {top_category} has the highest representation "
+                   "at {top_pct:.1f}% for {top_metric}. ",
+        'spread': "There is a difference of {spread} employees between the largest and smallest {name} categories."
+    },
+    'KPI Performance': {
+        'male_ahead': "Male employees outperform female employees by {diff:.1f}% in combined KPI achievement. ",
+        'female_ahead': "Female employees outperform male employees by {diff:.1f}% in combined KPI achievement. ",
+        'gender_average': "The overall KPI achievement average is {average:.1f}%.",
+        'zone': "{top_category} is the top performing zone with {highest:.1f}% combined KPI achievement. "
+                "{bottom_category} shows the lowest performance at {lowest:.1f}%. "
+                "The performance gap is {gap:.1f}% points. "
+                "The average combined KPI across selected zones is {average:.1f}%.",
+        'zone_above_average': " {above_pct:.0f}% of zones are performing above the average.",
+        'summary': "The {top_category} {name} category has the highest combined KPI achievement at {highest:.1f}%, "
+                   "while {bottom_category} has the lowest at {lowest:.1f}%. ",
+        'gap': "There's a notable {gap:.1f}% gap between the highest and lowest performing {name} categories."
+    },
+    'Performance Multiple': {
+        'male_ahead': "Male employees show a {ratio:.2f}x higher performance multiple than female employees. ",
+        'female_ahead': "Female employees show a {ratio:.2f}x higher performance multiple than male employees. ",
+        'summary': "The {top_category} {name} category achieves the highest performance multiple at {highest:.1f}x, "
+                   "while {bottom_category} has the lowest at {lowest:.1f}x. "
+                   "The overall average performance multiple is {average:.1f}x across all {name} categories.",
+        'gap': " The top performing category is {gap:.1f}x more effective than the lowest."
+    },
+    'Top vs Bottom Performers': {
+        'fallback': "Analysis of top and bottom performers across {name} categories reveals important performance trends. "
+                    "The difference between top and bottom performers highlights opportunities for targeted training and development.",
+        'summary': "Analysis of top and bottom performers across {name} categories reveals important performance trends. "
+                   "The difference between top and bottom performers highlights opportunities for targeted training and development. ",
+        'note:Gender': "Gender analysis of performance extremes may provide opportunities for more equitable development programs.",
+        'note:Education': "Educational background appears to correlate with performance extremes, suggesting targeted development programs by education level.",
+        'note:Experience': "Experience bands show varying performance distributions, indicating potential for experience-based mentoring initiatives.",
+        'note:Age': "Age-based performance differences highlight opportunities for cross-generational skill transfers."
+    },
+    'Time to First Sale': {
+        'fallback': "Time to first sale analysis across {name} categories reveals important onboarding efficiency patterns. "
+                    "Reducing time to productivity remains a key factor in improving overall organizational performance.",
+        'summary': "Time to first sale analysis across {name} categories reveals important onboarding efficiency patterns. ",
+        'closing': " Reducing time to productivity remains a key factor in improving overall organizational performance.",
+        'note:Gender': "Gender differences in time to first sale may indicate opportunities to optimize training approaches for different groups.",
+        'note:Education': "Educational background correlates with speed to productivity, suggesting tailored onboarding programs by education level.",
+        'note:Experience': "Experience-based variations in time to first sale highlight opportunities to leverage prior skills during onboarding.",
+        'note:Age': "Age-based differences in time to first sale suggest potential for age-specific training optimization."
+    },
+    'CAR2CATPO Ratio': {
+        'fallback': "The CAR2CATPO ratio analysis across {name} categories reveals important operational efficiency patterns. "
+                    "Understanding these patterns can help optimize resource allocation and workflow design.",
+        'summary': "The CAR2CATPO ratio analysis across {name} categories reveals important operational efficiency patterns. ",
+        'closing': " Understanding these patterns can help optimize resource allocation and workflow design.",
+        'note:Gender': "Gender-based ratio differences may indicate varying approaches to handling client interactions and workflow management.",
+        'note:Education': "Educational background appears to influence operational efficiency metrics, with certain education levels showing better process optimization.",
+        'note:Experience': "Experience levels demonstrate varying operational efficiency patterns, suggesting experience-specific process optimization opportunities.",
+        'note:Age': "Age groups show different operational efficiency metrics, highlighting potential for age-targeted process improvement initiatives."
+    },
+    'Attrition Count': {
+        'fallback': "Analysis of attrition patterns across {name} categories reveals important retention trends. "
+                    "Understanding these patterns can help develop targeted retention strategies and improve employee satisfaction.",
+        'summary': "The overall employee attrition rate across all {name} categories is {rate:.1f}%. ",
+        'note:Education': "Educational background appears to correlate with retention patterns, suggesting targeted retention strategies by education level.",
+        'note:Experience': "Experience-based attrition patterns indicate tenure-specific retention strategies may be beneficial.",
+        'note:Age': "Age-based attrition differences highlight potential for age-specific engagement initiatives.",
+        'note:Gender': "Gender-based attrition disparities may inform diversity and inclusion strategy improvements."
+    },
+    'Average Residency': {
+        'fallback': "Average residency analysis across {name} categories reveals important employee retention patterns. "
+                    "The comparison between top performers and all employees provides valuable insights for talent development strategies.",
+        'summary': "Top performers have on average {top_average:.2f} months of tenure compared to {all_average:.2f} months for all employees, ",
+        'longer': "representing {pct_diff:.1f}% longer tenure for high performers. ",
+        'shorter': "representing {pct_diff:.1f}% shorter tenure for high performers. ",
+        'note:Education': "Educational background appears to correlate with tenure patterns among top performers.",
+        'note:Experience': "Experience levels show varying tenure patterns, suggesting experience-based development opportunities.",
+        'note:Age': "Age-based tenure differences highlight opportunities for cross-generational mentoring and knowledge transfer.",
+        'note:Gender': "Gender-based tenure variations may inform talent development strategies."
+    },
+    'Infant Attrition': {
+        'fallback': "Infant attrition analysis across {name} categories reveals important early-stage retention patterns. "
+                    "Understanding these patterns can help improve onboarding and initial employee engagement strategies.",
+        'summary': "The {top_category} {name} category has the highest infant attrition rate at {highest:.1f}%, "
+                   "while the {bottom_category} category has the lowest at {lowest:.1f}%. "
+                   "The overall infant attrition average is {average:.1f}% across all {name} categories. ",
+        'note:Education': "Educational background appears to impact early attrition, suggesting education-specific onboarding adjustments may be beneficial.",
+        'note:Experience': "Experience levels show varying early attrition patterns, highlighting opportunities to strengthen onboarding for specific experience groups.",
+        'note:Age': "Age-based early attrition differences suggest tailoring early employment support by age group.",
+        'note:Gender': "Gender-based early attrition disparities may inform improved orientation and early career development programs."
+    }
+}
+
+# Number of rendered insights kept in memory (one per chart, category and dataset version)
+INSIGHT_CACHE_SIZE = 1024
+
+def compile_template(template):
+    """Parse a format template once into (literal, field, format spec) segments"""
+    return tuple((literal, field, spec) for literal, field, spec, _ in string.Formatter().parse(template))
+
+def render_template(segments, context):
+    """Render a compiled template with the given values"""
+    return ''.join(literal + (format(context[field], spec) if field is not None else '')
+                   for literal, field, spec in segments)
+
+# Every template is parsed once, at import
+COMPILED_TEMPLATES = {chart_name: {key: compile_template(template) for key, template in templates.items()}
+                      for chart_name, templates in INSIGHT_TEMPLATES.items()}
+
+def dataset_version(df):
+    """Return a content hash identifying one version of a sheet"""
+    digest = hashlib.sha256(repr(tuple(df.columns)).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+_insight_cache = OrderedDict()
+_insight_cache_lock = threading.Lock()
+
+def generate_insight(chart_name, df, name, stats=None, version=None):
+    """
+    Return the insight text of one chart, memoized per chart, category and dataset version.
+
+    `version` is the sheet's `dataset_version`; callers rendering several charts of
+    one sheet should compute it once and pass it in, as hashing the sheet costs more
+    than a cached lookup. Only a cache miss builds the template values from the
+    statistics table (computed here when not given) and renders the chart's compiled
+    fragments.
+    """
+    if version is None:
+        version = dataset_version(df)
+    key = (chart_name, name, version)
+    with _insight_cache_lock:
+        if key in _insight_cache:
+            _insight_cache.move_to_end(key)
+            return _insight_cache[key]
+
+    if stats is None:
+        stats = compute_sheet_statistics(df)
+    fragments, context = INSIGHT_BUILDERS[chart_name](df, name, stats)
+    context['name'] = name
+    templates = COMPILED_TEMPLATES[chart_name]
+    insights = ''.join(render_template(templates[fragment], context)
+                       for fragment in fragments if fragment in templates)
+
+    with _insight_cache_lock:
+        _insight_cache[key] = insights
+        if len(_insight_cache) > INSIGHT_CACHE_SIZE:
+            _insight_cache.popitem(last=False)
+    return insights
+
+def _distribution(df, name, stats):
+    first_cols = df.columns[:3]
+
+    # Category with the highest share of its cohort
+    top = None
+    for metric in [first_cols[1], first_cols[2]]:
+        metric_stats = stats[metric]
+        percentage = metric_stats['max'] / metric_stats['sum'] * 100
+        if top is None or percentage > top['top_pct']:
+            top = {'top_category': metric_stats['argmax'], 'top_pct': percentage, 'top_metric': metric}
+
+    cohort_totals = stats[COHORT_TOTAL]
+    if name == "Gender":
+        if 'Male' in cohort_totals['values'] and 'Female' in cohort_totals['values']:
+            male_count = cohort_totals['values']['Male']
+            female_count = cohort_totals['values']['Female']
+            top['ratio'] = male_count / female_count if female_count > 0 else 0
+            return ['gender'], top
+        return ['gender_incomplete'], top
+
+    fragments = ['summary']
+    if len(cohort_totals['values']) > 1:
+        fragments.append('spread')
+        top['spread'] = int(cohort_totals['max'] - cohort_totals['min'])
+    return fragments, top
+
+def _kpi_performance(df, name, stats):
+    # KPI values are stored as fractions; insights are reported as percentages
+    combined_stats = stats[df.columns[3]]
+    context = {
+        'highest': combined_stats['max'] * 100,
+        'lowest': combined_stats['min'] * 100,
+        'average': combined_stats['mean'] * 100,
+        'top_category': combined_stats['argmax'],
+        'bottom_category': combined_stats['argmin']
+    }
+    context['gap'] = context['highest'] - context['lowest']
+
+    if name == "Gender":
+        fragments = []
+        combined_values = combined_stats['values']
+        if 'Male' in combined_values and 'Female' in combined_values:
+            male_combined = combined_values['Male'] * 100
+            female_combined = combined_values['Female'] * 100
+            if male_combined > female_combined:
+                fragments.append('male_ahead')
+                context['diff'] = male_combined - female_combined
+            else:
+                fragments.append('female_ahead')
+                context['diff'] = female_combined - male_combined
+        return fragments + ['gender_average'], context
+
+    if name == "Zone":
+        context['above_pct'] = combined_stats['above_mean'] / len(df) * 100
+        return ['zone', 'zone_above_average'], context
+
+    return ['summary'] + (['gap'] if context['gap'] > 10 else []), context
+
+def _performance_multiple(df, name, stats):
+    multiple_stats = stats[df.columns[6]]
+    context = {
+        'top_category': multiple_stats['argmax'],
+        'highest': multiple_stats['max'],
+        'bottom_category': multiple_stats['argmin'],
+        'lowest': multiple_stats['min'],
+        'average': multiple_stats['mean']
+    }
+
+    if name == "Gender":
+        multiple_values = multiple_stats['values']
+        if 'Male' in multiple_values and 'Female' in multiple_values:
+            male_multiple = multiple_values['Male']
+            female_multiple = multiple_values['Female']
+            ratio = male_multiple / female_multiple if female_multiple > 0 else 0
+            if ratio > 1:
+                context['ratio'] = ratio
+                return ['male_ahead'], context
+            context['ratio'] = 1/ratio if ratio > 0 else 0
+            return ['female_ahead'], context
+        return [], context
+
+    # Highlight a significant gap between the best and worst categories
+    context['gap'] = context['highest'] / context['lowest'] if context['lowest'] > 0 else 0
+    return ['summary'] + (['gap'] if context['gap'] > 1.5 else []), context
+
+def _top_bottom_performers(df, name, stats):
+    if len(df.columns) <= 9:
+        return ['fallback'], {}
+    return ['summary', f'note:{name}'], {}
+
+def _single_column_notes(position):
+    """Builder for charts of one column whose insight is an introduction, a category note and a closing"""
+    def build(df, name, stats):
+        if len(df.columns) <= position:
+            return ['fallback'], {}
+        return ['summary', f'note:{name}', 'closing'], {}
+    return build
+
+def _attrition_count(df, name, stats):
+    if len(df.columns) <= 13:
+        return ['fallback'], {}
+    col2, col14 = df.columns[1], df.columns[13]
+    try:
+        total_employees = stats[col2]['sum'] if col2 in stats else 0
+        total_attrition = stats[col14]['sum'] if col14 in stats else 0
+        rate = (total_attrition / total_employees) * 100 if total_employees > 0 else 0
+    except Exception:
+        return ['fallback'], {}
+    return ['summary', f'note:{name}'], {'rate': rate}
+
+def _average_residency(df, name, stats):
+    if len(df.columns) <= 15:
+        return ['fallback'], {}
+    col15, col16 = df.columns[14], df.columns[15]
+    try:
+        # Tenure of top performers compared with all employees
+        top_average = stats[col16]['mean'] if col16 in stats else float('nan')
+        all_average = stats[col15]['mean'] if col15 in stats else float('nan')
+        diff = top_average - all_average
+        pct_diff = (diff / all_average) * 100 if all_average > 0 else 0
+    except Exception:
+        return ['fallback'], {}
+    context = {'top_average': top_average, 'all_average': all_average,
+               'pct_diff': pct_diff if diff > 0 else abs(pct_diff)}
+    return ['summary', 'longer' if diff > 0 else 'shorter', f'note:{name}'], context
+
+def _infant_attrition(df, name, stats):
+    # Columns without any values have no statistics
+    infant_col = df.columns[INFANT_ATTRITION_POSITION] if len(df.columns) > INFANT_ATTRITION_POSITION else None
+    if infant_col not in stats:
+        return ['fallback'], {}
+
+    attrition_stats = stats[infant_col]
+    if not (attrition_stats['argmax'] and attrition_stats['argmin']):
+        return ['fallback'], {}
+    return ['summary', f'note:{name}'], {
+        'top_category': attrition_stats['argmax'],
+        'highest': attrition_stats['max'] * 100,
+        'bottom_category': attrition_stats['argmin'],
+        'lowest': attrition_stats['min'] * 100,
+        'average': attrition_stats['mean'] * 100
+    }
+
+# Builders choosing the fragments and template values of each chart's insight
+INSIGHT_BUILDERS = {
+    'Distribution': _distribution,
+    'KPI Performance': _kpi_performance,
+    'Performance Multiple': _performance_multiple,
+    'Top vs Bottom Performers': _top_bottom_performers,
+    'Time to First Sale': _single_column_notes(11),
+    'CAR2CATPO Ratio': _single_column_notes(12),
+    'Attrition Count': _attrition_count,
+    'Average Residency': _average_residency,
+    'Infant Attrition': _infant_attrition
+}
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from aadhar_data import METRIC_NAMES
+
+# Column names of the long metric table
+DIMENSION = 'dimension'
+CATEGORY = 'category'
+METRIC = 'metric'
+VALUE = 'value'
+
+def build_metric_table(sheets):
+    """
+    Stack every category sheet into one long table of (dimension, category, metric, value).
+
+    Metric columns are picked by position and renamed to the short METRIC_NAMES, so the
+    same metric lines up across sheets whatever its header says. The table is indexed
+    and sorted by (metric, dimension, category), which turns "this metric across all
+    dimensions" into a single index lookup. Empty values are left out.
+    """
+    frames = []
+    for dimension, df in sheets.items():
+        metrics = df.iloc[:, 1:len(METRIC_NAMES) + 1]
+        metrics.columns = METRIC_NAMES[:metrics.shape[1]]
+        long = metrics.assign(**{CATEGORY: df['Category'].astype(str)}).melt(
+            id_vars=CATEGORY, var_name=METRIC, value_name=VALUE
+        )
+        frames.append(long.assign(**{DIMENSION: dimension}))
+
+    if not frames:
+        return pd.DataFrame(
+            {VALUE: pd.Series(dtype=float)},
+            index=pd.MultiIndex.from_arrays([[], [], []], names=[METRIC, DIMENSION, CATEGORY])
+        )
+
+    table = pd.concat(frames, ignore_index=True)
+    table[VALUE] = pd.to_numeric(table[VALUE], errors='coerce')
+    table = table.dropna(subset=[VALUE])
+    return table.set_index([METRIC, DIMENSION, CATEGORY])[[VALUE]].sort_index()
+
+def compare_metric(table, metric, dimensions=None):
+    """Return one metric for every (dimension, category) segment, optionally limited to some dimensions"""
+    if metric not in table.index.get_level_values(METRIC):
+        return pd.DataFrame(columns=[DIMENSION, CATEGORY, VALUE])
+
+    comparison = table.xs(metric, level=METRIC)
+    if dimensions is not None:
+        comparison = comparison[comparison.index.get_level_values(DIMENSION).isin(dimensions)]
+    return comparison.reset_index()
+
+def rank_segments(table, metric, dimensions=None, ascending=False, top=None):
+    """Rank every segment by one metric (1 = highest unless ascending), keeping the first `top` rows"""
+    ranking = compare_metric(table, metric, dimensions)
+    ranking = ranking.sort_values(VALUE, ascending=ascending, kind='stable').reset_index(drop=True)
+    ranking.insert(0, 'rank', ranking[VALUE].rank(ascending=ascending, method='min').astype(int))
+    if top is not None:
+        ranking = ranking.head(top)
+    return ranking
@@ -0,0 +1,1204 @@
+"""
+Storage backends for the dashboard recommendations.
+
+The backends hold the saved recommendation text of every chart card, keyed by
+``f"{name}_{chart_name}_recommendation"``. They have no Streamlit dependency, so
+the static site generator and command-line tools can use them as well as the
+dashboard; ``recommendation_storage`` wraps them with the session-state API.
+
+``SqliteBackend`` is the default: one row per card in a WAL-mode database, saved
+with a single-row upsert and looked up by key or by (category, chart).
+``JsonFileBackend`` keeps the original one-file layout for deployments that
+still rely on it. ``WriteBehindBackend`` wraps either one so that saves return
+at once and reach the store from a background thread.
+
+Every recommendation lives in a namespace: ``shared``, ``team:<name>`` or
+``user:<name>``. Writes go to one namespace; reads take a list of namespaces,
+most specific first, and return the first text found for each card, so a
+personal recommendation overrides the team's, which overrides the shared one.
+
+Every backend also publishes a change feed: ``changes_since(cursor)`` returns a
+new cursor and the (namespace, key) pairs changed after the old one, so readers
+can refresh just the cards that changed instead of re-reading the whole store.
+"""
+
+import atexit
+import difflib
+import html
+import itertools
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Advisory file locks: fcntl on POSIX systems, msvcrt on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+RECOMMENDATION_SUFFIX = '_recommendation'
+
+# File the JSON backend stores recommendations in; the SQLite store is seeded from it once
+RECOMMENDATIONS_FILE = 'aadhar_dashboard_recommendations.json'
+
+# Database of the default SQLite backend
+RECOMMENDATIONS_DB = 'aadhar_dashboard_recommendations.db'
+
+# Storage backend: 'sqlite' (default) or 'json' for the original single-file store
+RECOMMENDATIONS_BACKEND = os.environ.get('AADHAR_RECOMMENDATIONS_BACKEND', 'sqlite')
+
+# Seconds a writer waits for another connection's transaction before giving up
+BUSY_TIMEOUT = 5.0
+
+# Seconds between background flushes of the write-behind cache
+FLUSH_INTERVAL = 0.5
+
+# Attempts at replacing the JSON file while a reader on Windows still has it open
+REPLACE_ATTEMPTS = 5
+REPLACE_RETRY_DELAY = 0.05
+
+# Records read from or written to the store at a time by exports and imports
+BATCH_SIZE = 1000
+
+# Every this many versions of a card, history stores the full text instead of a delta
+HISTORY_CHECKPOINT_INTERVAL = 20
+
+# Changes kept in the SQLite change feed; readers further behind reload everything
+CHANGE_LOG_SIZE = 10000
+
+# Namespace read and written when no other is given
+SHARED_NAMESPACE = 'shared'
+
+# Separates the namespace from the key in the JSON backend's file; shared keys are stored bare
+NAMESPACE_SEPARATOR = '::'
+
+# Sources of searchable text: saved recommendations and the generated chart insights
+RECOMMENDATION_SOURCE = 'recommendation'
+INSIGHT_SOURCE = 'insight'
+
+# Characters of context kept around a match in search snippets
+SNIPPET_CONTEXT = 60
+
+# Placeholders marking matches inside snippets until the text has been HTML-escaped
+_MATCH_START = '\x02'
+_MATCH_END = '\x03'
+
+def split_key(key):
+    """Return the (category, chart) a recommendation key belongs to"""
+    stem = key[:-len(RECOMMENDATION_SUFFIX)] if key.endswith(RECOMMENDATION_SUFFIX) else key
+    category, _, chart = stem.partition('_')
+    return category, chart
+
+def recommendation_key(category, chart):
+    """Return the recommendation key of a category's chart card"""
+    return f"{category}_{chart}{RECOMMENDATION_SUFFIX}"
+
+def user_namespace(name):
+    return f"user:{name}"
+
+def team_namespace(name):
+    return f"team:{name}"
+
+def namespace_chain(user=None, team=None):
+    """Return the namespaces to read for a user and team, most specific first, ending with the shared one"""
+    chain = []
+    if user:
+        chain.append(user_namespace(user))
+    if team:
+        chain.append(team_namespace(team))
+    chain.append(SHARED_NAMESPACE)
+    return tuple(chain)
+
+def _namespace_order(namespaces):
+    """Return SQL placeholders for a list of namespaces and a CASE expression ranking them in order"""
+    placeholders = ', '.join('?' * len(namespaces))
+    order = 'CASE namespace ' + ' '.join(f'WHEN ? THEN {rank}' for rank in range(len(namespaces))) + ' END'
+    return placeholders, order
+
+def search_terms(query):
+    """Split a search query into lower-case words"""
+    return re.findall(r'\w+', query.lower())
+
+def highlight(snippet):
+    """HTML-escape a snippet and turn its match markers into <mark> tags"""
+    return html.escape(snippet).replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>')
+
+def scan_matches(texts, query, limit):
+    """
+    Search (key, source, text, namespace) tuples for texts containing every query word.
+
+    This is the fallback used where SQLite has no FTS5 and by the JSON backend.
+    Matches are returned as search results with a snippet around the first match.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    results = []
+    for key, source, text, namespace in texts:
+        lowered = text.lower()
+        if not all(term in lowered for term in terms):
+            continue
+        first = pattern.search(text)
+        start = max(first.start() - SNIPPET_CONTEXT, 0) if first else 0
+        window = text[start:start + 2 * SNIPPET_CONTEXT + len(terms[0])]
+        marked = pattern.sub(lambda m: f"{_MATCH_START}{m.group(0)}{_MATCH_END}", window)
+        prefix = '…' if start else ''
+        suffix = '…' if start + len(window) < len(text) else ''
+        results.append(_search_result(key, source, prefix + marked + suffix, namespace))
+        if len(results) == limit:
+            break
+    return results
+
+def _search_result(key, source, snippet, namespace=None):
+    category, chart = split_key(key)
+    return {'key': key, 'category': category, 'chart': chart, 'source': source,
+            'namespace': namespace, 'snippet': highlight(snippet)}
+
+def make_delta(old, new):
+    """
+    Encode `new` as edits to `old`: a JSON list of [n] (keep n characters),
+    [-n] (drop n characters) and ["text"] (insert text) operations.
+    """
+    delta = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            delta.append([i2 - i1])
+            continue
+        if i2 > i1:
+            delta.append([-(i2 - i1)])
+        if j2 > j1:
+            delta.append([new[j1:j2]])
+    return json.dumps(delta, separators=(',', ':'))
+
+def apply_delta(old, delta):
+    """Rebuild the text encoded by `make_delta` from the text it was made against"""
+    parts = []
+    position = 0
+    for (operation,) in json.loads(delta):
+        if isinstance(operation, str):
+            parts.append(operation)
+        elif operation > 0:
+            parts.append(old[position:position + operation])
+            position += operation
+        else:
+            position -= operation
+    return ''.join(parts)
+
+@contextmanager
+def exclusive_lock(path):
+    """
+    Hold an advisory lock on `path` (created if missing) until the block exits.
+
+    The lock is taken on its own file rather than on the data file, which is
+    replaced on every write. It excludes other processes as well as other threads.
+    """
+    with open(path, 'a+b') as handle:
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            # msvcrt locks byte ranges; LK_LOCK retries for about ten seconds before raising
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+def replace_file(path, write):
+    """
+    Atomically replace `path` with the text produced by `write(file)`.
+
+    The text goes to a temporary file in the same directory, which is flushed to
+    disk and then renamed over `path`, so readers and crashes only ever see the
+    old file or the complete new one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    handle = tempfile.NamedTemporaryFile('w', dir=directory, prefix=os.path.basename(path) + '.',
+                                         suffix='.tmp', delete=False)
+    try:
+        with handle:
+            write(handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        for attempt in range(REPLACE_ATTEMPTS):
+            try:
+                os.replace(handle.name, path)
+                return
+            except PermissionError:
+                # Windows refuses to replace a file another process is reading
+                if attempt == REPLACE_ATTEMPTS - 1:
+                    raise
+                time.sleep(REPLACE_RETRY_DELAY)
+    except BaseException:
+        if os.path.exists(handle.name):
+            os.remove(handle.name)
+        raise
+
+class JsonFileBackend:
+    """
+    Recommendations kept in a single JSON object, rewritten on every save.
+
+    Shared recommendations are stored under their plain key, as in files written
+    before namespaces existed; others under ``f"{namespace}::{key}"``.
+
+    Several processes can share the file. Each write reads, updates and replaces
+    the file while holding an advisory lock on ``<path>.lock``, so concurrent saves
+    are never lost, and the replacement is atomic, so reads need no lock at all.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Generated insights are cheap to regenerate, so this backend only keeps them in memory
+        self._insights = {}
+
+    @staticmethod
+    def _stored_key(namespace, key):
+        return key if namespace == SHARED_NAMESPACE else f"{namespace}{NAMESPACE_SEPARATOR}{key}"
+
+    @staticmethod
+    def _split_stored_key(stored):
+        namespace, separator, key = stored.rpartition(NAMESPACE_SEPARATOR)
+        return (namespace, key) if separator else (SHARED_NAMESPACE, stored)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def _update(self, change):
+        """Apply `change` to the stored dict under the write lock and atomically replace the file"""
+        with exclusive_lock(self.path + '.lock'):
+            stored = self._read()
+            result = change(stored)
+            replace_file(self.path, lambda f: json.dump(stored, f))
+        return result
+
+    def load_all(self, namespaces=(SHARED_NAMESPACE,)):
+        rank = {namespace: position for position, namespace in enumerate(namespaces)}
+        merged = {}
+        chosen = {}
+        for stored, value in self._read().items():
+            namespace, key = self._split_stored_key(stored)
+            if namespace in rank and rank[namespace] < chosen.get(key, len(rank)):
+                merged[key] = value
+                chosen[key] = rank[namespace]
+        return merged
+
+    def get(self, key, namespaces=(SHARED_NAMESPACE,)):
+        stored = self._read()
+        for namespace in namespaces:
+            value = stored.get(self._stored_key(namespace, key))
+            if value is not None:
+                return value
+        return None
+
+    def history(self, key, limit=None, namespace=SHARED_NAMESPACE):
+        # The single file only keeps the latest text
+        return []
+
+    def put_insights(self, items):
+        self._insights.update(items)
+
+    def search(self, query, limit=20, namespaces=(SHARED_NAMESPACE,)):
+        # Each card is searched by the text of the most specific namespace holding one
+        texts = []
+        found = set()
+        for namespace in namespaces:
+            for k, v in self.load_all((namespace,)).items():
+                if k not in found:
+                    found.add(k)
+                    texts.append((k, RECOMMENDATION_SOURCE, v, namespace))
+        texts.extend((k, INSIGHT_SOURCE, v, None) for k, v in self._insights.items())
+        return scan_matches(texts, query, limit)
+
+    def version(self):
+        """Return a token that changes whenever the file is replaced"""
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return info.st_ino, info.st_mtime_ns, info.st_size
+
+    def changes_since(self, cursor=None):
+        """
+        Return (cursor, changes) for the change feed.
+
+        The file does not record which keys changed, so `changes` is an empty list
+        while the file is unchanged and None, meaning re-read everything, otherwise.
+        """
+        version = self.version()
+        return version, ([] if cursor is not None and version == cursor else None)
+
+    def category(self, name, namespaces=(SHARED_NAMESPACE,)):
+        prefix = f"{name}_"
+        return {k: v for k, v in self.load_all(namespaces).items()
+                if k.startswith(prefix) and k.endswith(RECOMMENDATION_SUFFIX)}
+
+    def put(self, key, value, author=None, snapshot=None, namespace=SHARED_NAMESPACE):
+        self.put_records([(key, value, author, snapshot)], namespace=namespace)
+
+    def put_many(self, items, author=None, snapshot=None, namespace=SHARED_NAMESPACE):
+        self.put_records(((key, value, author, snapshot) for key, value in items), namespace=namespace)
+
+    def put_records(self, records, progress=None, namespace=SHARED_NAMESPACE):
+        def change(stored):
+            count = 0
+            for key, value, _, _ in records:
+                stored[self._stored_key(namespace, key)] = value
+                count += 1
+                if progress and count % BATCH_SIZE == 0:
+                    progress(count)
+            return count
+
+        count = self._update(change)
+        if progress:
+            progress(count)
+        return count
+
+    import_records = put_records
+
+    def iter_records(self, name=None, namespaces=(SHARED_NAMESPACE,)):
+        recommendations = self.category(name, namespaces) if name else self.load_all(namespaces)
+        return iter(sorted(recommendations.items()))
+
+    def replace_all(self, recommendations, namespace=SHARED_NAMESPACE):
+        def change(stored):
+            for k in [k for k in stored if self._split_stored_key(k)[0] == namespace]:
+                del stored[k]
+            stored.update((self._stored_key(namespace, k), v) for k, v in recommendations.items())
+
+        self._update(change)
+
+    def close(self):
+        pass
+
+class SqliteBackend:
+    """
+    Recommendations kept one row per namespace and card in a SQLite database in WAL mode.
+
+    Readers never block the writer and vice versa, and each save touches a single
+    row, so its cost does not grow with the number of stored recommendations.
+    Reading a card across namespaces is one lookup on the (namespace, key) primary
+    key. Every change is also recorded as a version (author, time, dataset snapshot)
+    holding only the edits from the previous version; the latest text stays in
+    its own row, so reading it never touches the history. Triggers append every
+    changed (namespace, key) to a change feed, of which the last CHANGE_LOG_SIZE
+    entries are kept.
+    Connections are opened per thread, as Streamlit serves every session from its
+    own thread. When the database is created and `legacy_json` names an existing
+    JSON store, its recommendations are copied over in the same transaction.
+    """
+
+    def __init__(self, path, legacy_json=None):
+        self.path = path
+        self.legacy_json = legacy_json
+        self._local = threading.local()
+        self._migrate()
+        self.full_text = self._connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'recommendations_fts'"
+        ).fetchone() is not None
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _migrate(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                migration(self, connection)
+                connection.execute(f"PRAGMA user_version = {target}")
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _upsert(self, connection, records, namespace):
+        """
+        Save (key, value, author, snapshot) records and their versions; unchanged values are skipped.
+
+        A key may appear several times, in save order; each save becomes its own version.
+        """
+        updated_at = datetime.now().isoformat(timespec='seconds')
+        rows = []
+        versions = []
+        # (value, latest version) of the keys already seen in this batch
+        current = {}
+        for key, value, author, snapshot in records:
+            if key in current:
+                previous, latest = current[key]
+            else:
+                row = connection.execute(
+                    "SELECT value FROM recommendations WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                previous = row[0] if row is not None else None
+                latest = connection.execute(
+                    "SELECT MAX(version) FROM recommendation_versions WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()[0] or 0
+            if previous == value:
+                continue
+            # A card without a current row (new, or removed by replace_all) starts again from empty
+            # text, as does every checkpoint, so reading recent history never replays old deltas
+            if previous is None or (latest + 1) % HISTORY_CHECKPOINT_INTERVAL == 0:
+                base, delta = 0, make_delta('', value)
+            else:
+                base, delta = latest, make_delta(previous, value)
+            rows.append((namespace, key, *split_key(key), value, updated_at))
+            versions.append((namespace, key, latest + 1, base, author, updated_at, snapshot, delta))
+            current[key] = (value, latest + 1)
+
+        connection.executemany(
+            """
+            INSERT INTO recommendations (namespace, key, category, chart, value, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+            """,
+            rows
+        )
+        connection.executemany(
+            """
+            INSERT INTO recommendation_versions (namespace, key, version, base, author, created_at, snapshot, delta)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            versions
+        )
+
+    @staticmethod
+    def _resolved(namespaces, name=None, columns='key, value'):
+        """
+        Return (sql, parameters) of a query over the rows that win across namespaces,
+        optionally for one category. `columns` can name key, value, namespace and row_id.
+        """
+        placeholders, order = _namespace_order(namespaces)
+        category = " AND category = ?" if name else ""
+        sql = f"""
+            SELECT {columns} FROM (
+                SELECT rowid AS row_id, key, value, namespace,
+                       ROW_NUMBER() OVER (PARTITION BY key ORDER BY {order}) AS choice
+                FROM recommendations WHERE namespace IN ({placeholders}){category}
+            ) WHERE choice = 1
+        """
+        return sql, [*namespaces, *namespaces, *([name] if name else [])]
+
+    def _merged(self, namespaces, name=None):
+        """Return a cursor over the (key, value) pairs resolved across namespaces, optionally for one category"""
+        sql, parameters = self._resolved(namespaces, name)
+        # A separate cursor keeps batched reads apart from other statements on this connection
+        return self._connection().cursor().execute(sql + " ORDER BY key", parameters)
+
+    def load_all(self, namespaces=(SHARED_NAMESPACE,)):
+        return dict(self._merged(namespaces))
+
+    def get(self, key, namespaces=(SHARED_NAMESPACE,)):
+        """Return a card's text from the first namespace that has one, in a single primary-key read"""
+        placeholders, order = _namespace_order(namespaces)
+        row = self._connection().execute(
+            f"SELECT value FROM recommendations WHERE namespace IN ({placeholders}) AND key = ? ORDER BY {order} LIMIT 1",
+            [*namespaces, key, *namespaces]
+        ).fetchone()
+        return row[0] if row else None
+
+    def category(self, name, namespaces=(SHARED_NAMESPACE,)):
+        return dict(self._merged(namespaces, name))
+
+    def chart(self, name, chart, namespaces=(SHARED_NAMESPACE,)):
+        return self.get(recommendation_key(name, chart), namespaces)
+
+    def history(self, key, limit=None, namespace=SHARED_NAMESPACE):
+        """
+        Return the saved versions of one recommendation in one namespace, newest first.
+
+        Each version is a dict with its number, author, creation time, dataset
+        snapshot and full text, rebuilt by replaying the deltas from the nearest
+        full-text checkpoint. With a `limit`, only the newest `limit` versions and
+        the few before them back to a checkpoint are read.
+        """
+        query = """
+            SELECT version, base, author, created_at, snapshot, delta
+            FROM recommendation_versions WHERE namespace = ? AND key = ? ORDER BY version DESC
+        """
+        parameters = [namespace, key]
+        if limit:
+            # Any HISTORY_CHECKPOINT_INTERVAL consecutive versions include a full text
+            query += " LIMIT ?"
+            parameters.append(limit + HISTORY_CHECKPOINT_INTERVAL - 1)
+        rows = self._connection().execute(query, parameters).fetchall()
+        rows.reverse()
+        start = next((i for i, row in enumerate(rows) if row[1] == 0), len(rows))
+
+        versions = []
+        text = ''
+        for version, base, author, created_at, snapshot, delta in rows[start:]:
+            text = apply_delta(text if base else '', delta)
+            versions.append({'version': version, 'author': author, 'created_at': created_at,
+                             'snapshot': snapshot, 'value': text})
+        versions.reverse()
+        return versions[:limit] if limit else versions
+
+    def put_insights(self, items):
+        """Store generated insight text per card; rows whose text is unchanged are not rewritten"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                """
+                INSERT INTO insights (key, category, chart, value) VALUES (?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value WHERE value != excluded.value
+                """,
+                ((key, *split_key(key), value) for key, value in items)
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def search(self, query, limit=20, namespaces=(SHARED_NAMESPACE,)):
+        """
+        Return the cards whose recommendation or insight contains every word of `query`.
+
+        Recommendations are resolved across the given namespaces first, as by `get`,
+        so a card overridden in a more specific namespace is only found by the text
+        that overrides it. Results are dicts with the key, category, chart, source,
+        namespace and an HTML snippet with the matches in <mark> tags. Saved
+        recommendations come before generated insights, as bm25 scores of the two
+        indexes are not comparable; within each, best matches come first. The FTS5
+        indexes are used when SQLite provides them, a scan of both tables otherwise.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+        connection = self._connection()
+        resolved, parameters = self._resolved(namespaces, columns='row_id, key, value, namespace')
+        if not self.full_text:
+            texts = itertools.chain(
+                ((k, RECOMMENDATION_SOURCE, v, namespace)
+                 for _, k, v, namespace in connection.execute(resolved, parameters)),
+                ((k, INSIGHT_SOURCE, v, None) for k, v in connection.execute("SELECT key, value FROM insights"))
+            )
+            return scan_matches(texts, query, limit)
+
+        # Quote every word so user input cannot form FTS5 syntax; the last word also matches as a prefix
+        match = ' '.join(f'"{term}"' for term in terms) + '*'
+        rows = connection.execute(
+            f"""
+            SELECT key, source, snippet, namespace FROM (
+                SELECT r.key, '{RECOMMENDATION_SOURCE}' AS source, 0 AS source_order, bm25(recommendations_fts) AS rank,
+                       snippet(recommendations_fts, 0, '{_MATCH_START}', '{_MATCH_END}', '…', 16) AS snippet,
+                       r.namespace
+                FROM recommendations_fts JOIN ({resolved}) r ON r.row_id = recommendations_fts.rowid
+                WHERE recommendations_fts MATCH ?
+                UNION ALL
+                SELECT i.key, '{INSIGHT_SOURCE}', 1, bm25(insights_fts),
+                       snippet(insights_fts, 0, '{_MATCH_START}', '{_MATCH_END}', '…', 16), NULL
+                FROM insights_fts JOIN insights i ON i.rowid = insights_fts.rowid
+                WHERE insights_fts MATCH ?
+            ) ORDER BY source_order, rank LIMIT ?
+            """,
+            [*parameters, match, match, limit]
+        ).fetchall()
+        return [_search_result(*row) for row in rows]
+
+    def version(self):
+        """Return the store's change counter, bumped by every insert, update and delete"""
+        return self._connection().execute("SELECT version FROM store_version").fetchone()[0]
+
+    def changes_since(self, cursor=None):
+        """
+        Return (cursor, changes): the latest change-feed position and the (namespace, key)
+        pairs changed after `cursor`. `changes` is None when `cursor` is None or older
+        than the oldest change kept, meaning the reader has to re-read everything.
+        """
+        connection = self._connection()
+        # Both queries are reads of the feed's integer primary key, whatever its size
+        latest = connection.execute("SELECT MAX(seq) FROM recommendation_changes").fetchone()[0] or 0
+        if cursor is None:
+            return latest, None
+        if latest == cursor:
+            return latest, []
+        oldest = connection.execute("SELECT MIN(seq) FROM recommendation_changes").fetchone()[0]
+        if oldest is None or oldest > cursor + 1:
+            return latest, None
+        changes = connection.execute(
+            "SELECT DISTINCT namespace, key FROM recommendation_changes WHERE seq > ? AND seq <= ?",
+            (cursor, latest)
+        ).fetchall()
+        return latest, changes
+
+    def put(self, key, value, author=None, snapshot=None, namespace=SHARED_NAMESPACE):
+        self.put_records([(key, value, author, snapshot)], namespace=namespace)
+
+    def put_many(self, items, author=None, snapshot=None, namespace=SHARED_NAMESPACE):
+        self.put_records(((key, value, author, snapshot) for key, value in items), namespace=namespace)
+
+    def put_records(self, records, progress=None, namespace=SHARED_NAMESPACE):
+        """
+        Upsert (key, value, author, snapshot) records into one namespace in one transaction.
+
+        Records are consumed BATCH_SIZE at a time, so an import streamed from a file
+        is never held in memory whole; `progress` is called with the running count
+        after every batch.
+        """
+        connection = self._connection()
+        records = iter(records)
+        count = 0
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                batch = list(itertools.islice(records, BATCH_SIZE))
+                if not batch:
+                    break
+                self._upsert(connection, batch, namespace)
+                count += len(batch)
+                if progress:
+                    progress(count)
+            _prune_changes(connection)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return count
+
+    import_records = put_records
+
+    def iter_records(self, name=None, namespaces=(SHARED_NAMESPACE,)):
+        """Yield resolved (key, value) pairs of all recommendations, or one category's, BATCH_SIZE rows at a time"""
+        cursor = self._merged(namespaces, name)
+        while True:
+            rows = cursor.fetchmany(BATCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+
+    def replace_all(self, recommendations, namespace=SHARED_NAMESPACE):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Only removed cards are deleted; unchanged ones keep their row and get no new version
+            stored = [key for (key,) in connection.execute(
+                "SELECT key FROM recommendations WHERE namespace = ?", (namespace,)
+            )]
+            connection.executemany(
+                "DELETE FROM recommendations WHERE namespace = ? AND key = ?",
+                ((namespace, key) for key in stored if key not in recommendations)
+            )
+            self._upsert(connection, ((k, v, None, None) for k, v in recommendations.items()), namespace)
+            _prune_changes(connection)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+class WriteBehindBackend:
+    """
+    Write-behind cache in front of another backend.
+
+    Saves are acknowledged as soon as they are held in memory; a daemon thread
+    flushes them to the wrapped backend every `interval` seconds, one transaction
+    per namespace, and once more when the process exits. Repeated saves of the
+    same key between flushes go out in the same transaction, each in order, so
+    every save is still recorded as its own version. Reads see the latest pending
+    save of a key before it is flushed. A failed flush keeps its saves pending and is
+    retried on the next interval; the error is kept in `last_error` until a flush
+    succeeds. The change feed lists local saves as soon as they are made, ahead
+    of the wrapped backend's own feed.
+    """
+
+    # Local saves remembered for `changes_since`; readers further behind re-read everything
+    LOCAL_LOG_SIZE = 1024
+
+    def __init__(self, backend, interval=FLUSH_INTERVAL):
+        self.backend = backend
+        self.interval = interval
+        self.last_error = None
+        # Saves keyed by (namespace, key), each holding a list of (value, author, snapshot) in save order
+        self._pending = {}
+        self._flushing = {}
+        self._generation = 0
+        # (generation, namespace, key) of recent local saves
+        self._local_log = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='recommendation-flush', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def _write(self, saves):
+        by_namespace = {}
+        for (namespace, key), saved in saves.items():
+            by_namespace.setdefault(namespace, []).extend((key, *save) for save in saved)
+        for namespace, records in by_namespace.items():
+            self.backend.put_records(records, namespace=namespace)
+
+    def _requeue(self, saves):
+        # Put the saves back ahead of any made to the same key in the meantime
+        with self._lock:
+            for entry, saved in saves.items():
+                self._pending[entry] = saved + self._pending.get(entry, [])
+
+    def flush(self):
+        """Write all pending saves to the wrapped backend; returns True when nothing is left pending"""
+        with self._flush_lock:
+            # Saves being written stay readable until the write has committed
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._flushing = pending
+            if not pending:
+                return True
+            try:
+                self._write(pending)
+                self.last_error = None
+                return True
+            except Exception as e:
+                self._requeue(pending)
+                self.last_error = e
+                return False
+            finally:
+                with self._lock:
+                    self._flushing = {}
+
+    def pending(self):
+        """Return the number of saves not yet written to the wrapped backend"""
+        with self._lock:
+            return sum(len(saved) for saved in self._pending.values())
+
+    def _unsaved(self, namespaces, prefix=''):
+        """Return the unflushed saves in the given namespaces as {key: {namespace: value}}"""
+        unsaved = {}
+        with self._lock:
+            for saves in (self._flushing, self._pending):
+                for (namespace, key), saved in saves.items():
+                    if namespace in namespaces and key.startswith(prefix):
+                        unsaved.setdefault(key, {})[namespace] = saved[-1][0]
+        return unsaved
+
+    def _resolve(self, key, values, namespaces):
+        # The first namespace with an unflushed save or a stored text wins
+        for namespace in namespaces:
+            if namespace in values:
+                return values[namespace]
+            stored = self.backend.get(key, (namespace,))
+            if stored is not None:
+                return stored
+        return None
+
+    def load_all(self, namespaces=(SHARED_NAMESPACE,)):
+        recommendations = self.backend.load_all(namespaces)
+        for key, values in self._unsaved(namespaces).items():
+            recommendations[key] = self._resolve(key, values, namespaces)
+        return recommendations
+
+    def version(self):
+        # Local saves count as changes before they are flushed
+        with self._lock:
+            generation = self._generation
+        return self.backend.version(), generation
+
+    def changes_since(self, cursor=None):
+        """Return (cursor, changes) combining the wrapped backend's feed with local saves"""
+        backend_cursor, seen = cursor if cursor is not None else (None, 0)
+        backend_cursor, changes = self.backend.changes_since(backend_cursor)
+        with self._lock:
+            generation = self._generation
+            local = [(namespace, key) for logged, namespace, key in self._local_log if logged > seen]
+            # Imports and replacements are not logged key by key, and old saves drop out of the log
+            complete = generation == seen or (self._local_log and self._local_log[0][0] <= seen + 1)
+        cursor = (backend_cursor, generation)
+        if changes is None or not complete:
+            return cursor, None
+        return cursor, changes + local
+
+    def get(self, key, namespaces=(SHARED_NAMESPACE,)):
+        values = self._unsaved(namespaces, key).get(key)
+        if values is None:
+            return self.backend.get(key, namespaces)
+        return self._resolve(key, values, namespaces)
+
+    def history(self, key, limit=None, namespace=SHARED_NAMESPACE):
+        # Write out pending saves of this card first so its newest version is listed
+        if key in self._unsaved((namespace,), key):
+            self.flush()
+        return self.backend.history(key, limit, namespace)
+
+    def put_insights(self, items):
+        self.backend.put_insights(items)
+
+    def search(self, query, limit=20, namespaces=(SHARED_NAMESPACE,)):
+        # Write out pending saves first so they can be found
+        self.flush()
+        return self.backend.search(query, limit, namespaces)
+
+    def category(self, name, namespaces=(SHARED_NAMESPACE,)):
+        recommendations = self.backend.category(name, namespaces)
+        for key, values in self._unsaved(namespaces, f"{name}_").items():
+            recommendations[key] = self._resolve(key, values, namespaces)
+        return recommendations
+
+    def put(self, key, value, author=None, snapshot=None, namespace=SHARED_NAMESPACE):
+        self.put_records([(key, value, author, snapshot)], namespace=namespace)
+
+    def put_many(self, items, author=None, snapshot=None, namespace=SHARED_NAMESPACE):
+        self.put_records(((key, value, author, snapshot) for key, value in items), namespace=namespace)
+
+    def put_records(self, records, progress=None, namespace=SHARED_NAMESPACE):
+        """
+        Queue records for the background flush and return how many were queued.
+
+        With `progress`, the caller is following a bulk write, so the records go
+        straight to the wrapped backend, which reports the running count.
+        """
+        if progress:
+            with self._flush_lock:
+                self._write_queued()
+                return self.backend.put_records(records, progress, namespace)
+        count = 0
+        with self._lock:
+            self._generation += 1
+            for key, value, author, snapshot in records:
+                self._pending.setdefault((namespace, key), []).append((value, author, snapshot))
+                self._local_log.append((self._generation, namespace, key))
+                count += 1
+            del self._local_log[:-self.LOCAL_LOG_SIZE]
+        return count
+
+    def import_records(self, records, progress=None, namespace=SHARED_NAMESPACE):
+        """Write a bulk import straight to the wrapped backend in its own transaction"""
+        with self._flush_lock:
+            self._write_queued()
+            return self.backend.import_records(records, progress, namespace)
+
+    def _write_queued(self):
+        """Write out every queued save ahead of a direct write, so the direct write wins; needs `_flush_lock`"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._generation += 1
+            self._local_log = []
+        try:
+            self._write(pending)
+        except Exception:
+            self._requeue(pending)
+            raise
+
+    def iter_records(self, name=None, namespaces=(SHARED_NAMESPACE,)):
+        self.flush()
+        return self.backend.iter_records(name, namespaces)
+
+    def replace_all(self, recommendations, namespace=SHARED_NAMESPACE):
+        # Saves to the namespace made before a full replacement are superseded by it
+        with self._flush_lock:
+            with self._lock:
+                self._pending = {entry: saved for entry, saved in self._pending.items() if entry[0] != namespace}
+                self._generation += 1
+                self._local_log = []
+            self.backend.replace_all(recommendations, namespace)
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+        self.flush()
+        self.backend.close()
+
+class RecommendationCache:
+    """
+    Process-wide parsed copy of a backend's recommendations, resolved across namespaces.
+
+    `refresh` polls the backend's change feed and re-reads only the keys it
+    lists, falling back to a full reload when the feed cannot say what changed,
+    and records which keys now differ from the previous copy. Each refresh that
+    changes anything bumps `generation`; a reader that remembers the generation
+    it last saw gets just the keys changed since then from `changed_since`.
+
+    The cache is shared by every session thread reading the same namespaces, so
+    `values` is never changed in place: a refresh builds a new dict and swaps it
+    in, and a dict once handed out stays the same.
+    """
+
+    # Refreshes remembered for `changed_since`; older readers get every key
+    LOG_SIZE = 256
+
+    def __init__(self, backend, namespaces=(SHARED_NAMESPACE,)):
+        self.backend = backend
+        self.namespaces = tuple(namespaces)
+        self.values = {}
+        self.generation = 0
+        self._cursor = None
+        self._log = []
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Bring the copy up to date with the backend's change feed; returns (generation, values)"""
+        with self._lock:
+            cursor, changes = self.backend.changes_since(self._cursor)
+            if changes is None or not self.generation:
+                values = self.backend.load_all(self.namespaces)
+                changed = [k for k, v in values.items() if self.values.get(k) != v]
+                changed.extend(k for k in self.values if k not in values)
+                self.values = values
+            else:
+                # Only the changed cards are looked up again, each in one read
+                changed = []
+                values = dict(self.values)
+                for key in {key for namespace, key in changes if namespace in self.namespaces}:
+                    value = self.backend.get(key, self.namespaces)
+                    if value != values.get(key):
+                        changed.append(key)
+                        if value is None:
+                            values.pop(key, None)
+                        else:
+                            values[key] = value
+                if changed:
+                    self.values = values
+            self._cursor = cursor
+            if not changed and self.generation:
+                return self.generation, self.values
+            self.generation += 1
+            self._log.append((self.generation, changed))
+            del self._log[:-self.LOG_SIZE]
+            return self.generation, self.values
+
+    def changed_since(self, generation):
+        """Return the keys changed after `generation`, or None when every key must be re-read"""
+        with self._lock:
+            if not generation or not self._log or self._log[0][0] > generation + 1:
+                return None
+            changed = set()
+            for logged, keys in self._log:
+                if logged > generation:
+                    changed.update(keys)
+            return changed
+
+def open_backend():
+    """Open the configured store (RECOMMENDATIONS_BACKEND) directly, without a write-behind cache"""
+    if RECOMMENDATIONS_BACKEND == 'json':
+        return JsonFileBackend(RECOMMENDATIONS_FILE)
+    return SqliteBackend(RECOMMENDATIONS_DB, legacy_json=RECOMMENDATIONS_FILE)
+
+def _create_recommendations(backend, connection):
+    connection.execute("""
+        CREATE TABLE recommendations (
+            key TEXT PRIMARY KEY,
+            category TEXT NOT NULL,
+            chart TEXT NOT NULL,
+            value TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    connection.execute("CREATE INDEX recommendations_category_chart ON recommendations (category, chart)")
+
+    # One-time copy of the recommendations saved by the JSON backend
+    if backend.legacy_json and os.path.exists(backend.legacy_json):
+        legacy = JsonFileBackend(backend.legacy_json).load_all()
+        connection.executemany(
+            "INSERT INTO recommendations (key, category, chart, value, updated_at) VALUES (?, ?, ?, ?, ?)",
+            ((k, *split_key(k), str(v), datetime.now().isoformat(timespec='seconds'))
+             for k, v in legacy.items() if k.endswith(RECOMMENDATION_SUFFIX))
+        )
+
+def _create_version_triggers(connection):
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        connection.execute(f"""
+            CREATE TRIGGER recommendations_version_{event.lower()} AFTER {event} ON recommendations
+            BEGIN
+                UPDATE store_version SET version = version + 1;
+            END
+        """)
+
+def _create_store_version(backend, connection):
+    # A single-row counter lets readers tell in one lookup whether anything changed
+    connection.execute("CREATE TABLE store_version (version INTEGER NOT NULL)")
+    connection.execute("INSERT INTO store_version (version) VALUES (0)")
+    _create_version_triggers(connection)
+
+def _create_versions(backend, connection):
+    # `base` is the version a delta applies to, or 0 when it applies to empty text
+    connection.execute("""
+        CREATE TABLE recommendation_versions (
+            key TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            base INTEGER NOT NULL,
+            author TEXT,
+            created_at TEXT NOT NULL,
+            snapshot TEXT,
+            delta TEXT NOT NULL,
+            PRIMARY KEY (key, version)
+        ) WITHOUT ROWID
+    """)
+
+    # The text already stored becomes the first version of every card
+    connection.execute("""
+        INSERT INTO recommendation_versions (key, version, base, author, created_at, snapshot, delta)
+        SELECT key, 1, 0, NULL, updated_at, NULL, json_array(json_array(value)) FROM recommendations
+    """)
+
+def _create_search_triggers(connection, table):
+    # Keep an external-content index in step with its table row by row
+    index = f"{table}_fts"
+    connection.execute(f"""
+        CREATE TRIGGER {index}_insert AFTER INSERT ON {table} BEGIN
+            INSERT INTO {index} (rowid, value) VALUES (new.rowid, new.value);
+        END
+    """)
+    connection.execute(f"""
+        CREATE TRIGGER {index}_delete AFTER DELETE ON {table} BEGIN
+            INSERT INTO {index} ({index}, rowid, value) VALUES ('delete', old.rowid, old.value);
+        END
+    """)
+    connection.execute(f"""
+        CREATE TRIGGER {index}_update AFTER UPDATE OF value ON {table} BEGIN
+            INSERT INTO {index} ({index}, rowid, value) VALUES ('delete', old.rowid, old.value);
+            INSERT INTO {index} (rowid, value) VALUES (new.rowid, new.value);
+        END
+    """)
+
+def _create_search_index(backend, connection):
+    connection.execute("""
+        CREATE TABLE insights (
+            key TEXT PRIMARY KEY,
+            category TEXT NOT NULL,
+            chart TEXT NOT NULL,
+            value TEXT NOT NULL
+        )
+    """)
+
+    # Without FTS5 the search falls back to scanning both tables
+    try:
+        connection.execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(value)")
+        connection.execute("DROP TABLE fts5_probe")
+    except sqlite3.OperationalError:
+        return
+
+    for table in ('recommendations', 'insights'):
+        index = f"{table}_fts"
+        connection.execute(f"CREATE VIRTUAL TABLE {index} USING fts5(value, content='{table}', content_rowid='rowid')")
+        _create_search_triggers(connection, table)
+        connection.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+
+def _add_namespaces(backend, connection):
+    # SQLite cannot change a primary key in place, so both tables are rebuilt with a namespace column
+    triggers = [name for (name,) in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'recommendations'"
+    )]
+    for trigger in triggers:
+        connection.execute(f"DROP TRIGGER {trigger}")
+
+    connection.execute("""
+        CREATE TABLE recommendations_namespaced (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            category TEXT NOT NULL,
+            chart TEXT NOT NULL,
+            value TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (namespace, key)
+        )
+    """)
+    # Keeping the rowids keeps the search index pointing at the same rows
+    connection.execute(f"""
+        INSERT INTO recommendations_namespaced (rowid, namespace, key, category, chart, value, updated_at)
+        SELECT rowid, '{SHARED_NAMESPACE}', key, category, chart, value, updated_at FROM recommendations
+    """)
+    connection.execute("DROP TABLE recommendations")
+    connection.execute("ALTER TABLE recommendations_namespaced RENAME TO recommendations")
+    connection.execute("CREATE INDEX recommendations_namespace_category ON recommendations (namespace, category, chart)")
+
+    connection.execute("""
+        CREATE TABLE recommendation_versions_namespaced (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            base INTEGER NOT NULL,
+            author TEXT,
+            created_at TEXT NOT NULL,
+            snapshot TEXT,
+            delta TEXT NOT NULL,
+            PRIMARY KEY (namespace, key, version)
+        ) WITHOUT ROWID
+    """)
+    connection.execute(f"""
+        INSERT INTO recommendation_versions_namespaced
+        SELECT '{SHARED_NAMESPACE}', key, version, base, author, created_at, snapshot, delta FROM recommendation_versions
+    """)
+    connection.execute("DROP TABLE recommendation_versions")
+    connection.execute("ALTER TABLE recommendation_versions_namespaced RENAME TO recommendation_versions")
+
+    _create_version_triggers(connection)
+    if 'recommendations_fts_insert' in triggers:
+        _create_search_triggers(connection, 'recommendations')
+        connection.execute("INSERT INTO recommendations_fts (recommendations_fts) VALUES ('rebuild')")
+
+def _create_change_feed(backend, connection):
+    # AUTOINCREMENT keeps sequence numbers increasing after old changes are pruned
+    connection.execute("""
+        CREATE TABLE recommendation_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL
+        )
+    """)
+    for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+        connection.execute(f"""
+            CREATE TRIGGER recommendations_change_{event.lower()} AFTER {event} ON recommendations
+            BEGIN
+                INSERT INTO recommendation_changes (namespace, key) VALUES ({row}.namespace, {row}.key);
+            END
+        """)
+
+def _prune_changes(connection):
+    """Drop change-feed entries older than the last CHANGE_LOG_SIZE"""
+    connection.execute(
+        "DELETE FROM recommendation_changes WHERE seq <= (SELECT MAX(seq) FROM recommendation_changes) - ?",
+        (CHANGE_LOG_SIZE,)
+    )
+
+def _add_history_checkpoints(backend, connection):
+    # Versions saved before checkpoints existed are rewritten as full text where one is due
+    text = ''
+    card = None
+    checkpoints = []
+    for namespace, key, version, base, delta in connection.execute(
+        "SELECT namespace, key, version, base, delta FROM recommendation_versions ORDER BY namespace, key, version"
+    ).fetchall():
+        if (namespace, key) != card:
+            card, text = (namespace, key), ''
+        text = apply_delta(text if base else '', delta)
+        if base and version % HISTORY_CHECKPOINT_INTERVAL == 0:
+            checkpoints.append((make_delta('', text), namespace, key, version))
+    connection.executemany(
+        "UPDATE recommendation_versions SET base = 0, delta = ? WHERE namespace = ? AND key = ? AND version = ?",
+        checkpoints
+    )
+
+# Schema migrations in order; PRAGMA user_version records how many have been applied
+MIGRATIONS = [_create_recommendations, _create_store_version, _create_versions, _create_search_index,
+              _add_namespaces, _create_change_feed, _add_history_checkpoints]
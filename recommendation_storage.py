@@ -1,99 +1,299 @@
+import io
 import json
-import os
+import threading
 import streamlit as st
+from collections import OrderedDict
 from datetime import datetime
 
-# File to store recommendations permanently
-RECOMMENDATIONS_FILE = 'aadhar_dashboard_recommendations.json'
+from recommendation_backends import (
+    WriteBehindBackend, RecommendationCache, RECOMMENDATION_SUFFIX, SHARED_NAMESPACE,
+    open_backend, namespace_chain, user_namespace, team_namespace
+)
 
-def load_recommendations():
-    """Load saved recommendations from file"""
+# Session-state key holding the cache, and its generation, a session last copied recommendations from
+GENERATION_KEY = '_recommendations_generation'
+
+# Session-state key of the name recorded as the author of saved recommendations
+AUTHOR_KEY = 'recommendation_author'
+
+# Author recorded for saves made without a name in the sidebar
+ANONYMOUS_AUTHOR = 'anonymous'
+
+# Session-state keys of the session's team and of where its saves go (one of SAVE_SCOPES)
+TEAM_KEY = 'recommendation_team'
+SCOPE_KEY = 'recommendation_scope'
+
+# Session-state key of the recommendation versions already read, with the change-feed cursor they are current at
+HISTORY_KEY = '_recommendation_history'
+
+# Where a session can save recommendations; personal and team text override shared text for that user or team
+SAVE_SCOPES = ['Shared', 'Team', 'Personal']
+
+# Seconds between each card's checks for recommendations saved in other sessions
+CHANGE_POLL_INTERVAL = 5
+
+# Resolved copies kept per process, one per user/team chain; the least recently used is dropped first
+CACHE_LIMIT = 8
+
+_backend = None
+_caches = OrderedDict()
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """
+    Return the process-wide recommendation backend, opening it on first use.
+
+    The store sits behind a write-behind cache, so saving from the dashboard never
+    waits for the disk; pending saves are flushed in the background and at exit.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = WriteBehindBackend(open_backend())
+        return _backend
+
+def get_cache(namespaces=(SHARED_NAMESPACE,)):
+    """Return the process-wide parsed copy of the recommendations resolved across the given namespaces"""
+    backend = get_backend()
+    with _backend_lock:
+        if namespaces in _caches:
+            _caches.move_to_end(namespaces)
+        else:
+            _caches[namespaces] = RecommendationCache(backend, namespaces)
+            while len(_caches) > CACHE_LIMIT:
+                _caches.popitem(last=False)
+        return _caches[namespaces]
+
+def current_namespaces():
+    """Return the namespaces this session reads, most specific first: its user, its team, then shared"""
+    return namespace_chain(st.session_state.get(AUTHOR_KEY, '').strip(),
+                           st.session_state.get(TEAM_KEY, '').strip())
+
+def current_write_namespace():
+    """Return the namespace this session saves to, or None when its scope needs a name or team not yet entered"""
+    scope = st.session_state.get(SCOPE_KEY, 'Shared')
+    if scope == 'Personal':
+        user = st.session_state.get(AUTHOR_KEY, '').strip()
+        return user_namespace(user) if user else None
+    if scope == 'Team':
+        team = st.session_state.get(TEAM_KEY, '').strip()
+        return team_namespace(team) if team else None
+    return SHARED_NAMESPACE
+
+def current_author():
+    """Return the name entered for this session, or ANONYMOUS_AUTHOR when none was entered"""
+    # The server's operating-system user says nothing about who is using the dashboard
+    return st.session_state.get(AUTHOR_KEY, '').strip() or ANONYMOUS_AUTHOR
+
+def load_recommendations(namespaces=(SHARED_NAMESPACE,)):
+    """Load saved recommendations from storage, by default the shared ones"""
     try:
-        if os.path.exists(RECOMMENDATIONS_FILE):
-            with open(RECOMMENDATIONS_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+        return get_backend().load_all(namespaces)
     except Exception as e:
         st.warning(f"Could not load recommendations: {str(e)}")
         return {}
 
 def save_recommendations(recommendations):
-    """Save recommendations to file"""
+    """Replace the stored recommendations with the given ones"""
     try:
-        with open(RECOMMENDATIONS_FILE, 'w') as f:
-            json.dump(recommendations, f)
+        get_backend().replace_all(recommendations)
         return True
     except Exception as e:
         st.error(f"Could not save recommendations: {str(e)}")
         return False
 
 def export_recommendations(name=None):
-    """Export recommendations to a timestamped file"""
+    """
+    Export saved recommendations, for one category or all of them, to a timestamped
+    JSON Lines file with one {"key": ..., "value": ...} record per line. Records are
+    streamed from the store in batches rather than collected first.
+    """
     try:
         # Get current timestamp for filename
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Determine which recommendations to export
-        if name:
-            # Export only recommendations for a specific category
-            recommendations = {k: v for k, v in st.session_state.items() 
-                               if k.startswith(f"{name}_") and k.endswith("_recommendation")}
-            filename = f"recommendations_{name}_{timestamp}.json"
-        else:
-            # Export all recommendations
-            recommendations = {k: v for k, v in st.session_state.items() 
-                               if k.endswith("_recommendation")}
-            filename = f"recommendations_all_{timestamp}.json"
-        
-        # Save to file
+        filename = f"recommendations_{name or 'all'}_{timestamp}.jsonl"
+
         with open(filename, 'w') as f:
-            json.dump(recommendations, f, indent=4)
-        
+            for key, value in get_backend().iter_records(name, current_namespaces()):
+                f.write(json.dumps({'key': key, 'value': value}) + "\n")
+
         return filename
     except Exception as e:
         st.error(f"Error exporting recommendations: {str(e)}")
         return None
 
-def import_recommendations(file_content):
-    """Import recommendations from uploaded file content"""
+def category_recommendations(name):
+    """Return the recommendations held in session state for a single category"""
+    return {k: v for k, v in st.session_state.items()
+            if k.startswith(f"{name}_") and k.endswith(RECOMMENDATION_SUFFIX)}
+
+def read_recommendation_records(source):
+    """
+    Yield (key, value) pairs from exported recommendations, given as text or a binary file.
+
+    JSON Lines exports are read one line at a time; files holding a single JSON object
+    (the format of earlier exports) are parsed whole.
+    """
+    lines = io.StringIO(source) if isinstance(source, str) else io.TextIOWrapper(source, encoding='utf-8')
     try:
-        recommendations = json.loads(file_content)
-        
-        # Update session state with imported recommendations
-        for k, v in recommendations.items():
-            if k.endswith("_recommendation"):
-                st.session_state[k] = v
-                
-        # Also update the persistent storage
-        current_recs = load_recommendations()
-        current_recs.update(recommendations)
-        save_recommendations(current_recs)
-        
+        first = lines.readline()
+        try:
+            record = json.loads(first)
+        except ValueError:
+            record = None
+        if not (isinstance(record, dict) and 'key' in record and 'value' in record):
+            yield from json.loads(first + lines.read()).items()
+            return
+
+        yield record['key'], record['value']
+        for line in lines:
+            if line.strip():
+                record = json.loads(line)
+                yield record['key'], record['value']
+    finally:
+        # Leave an uploaded file open for its owner
+        if isinstance(lines, io.TextIOWrapper):
+            lines.detach()
+
+def import_recommendations(source, progress=None):
+    """
+    Import recommendations from an export, given as text or a binary file.
+
+    Records are streamed into the store in batches inside a single transaction;
+    `progress` is called with the number imported so far after every batch.
+    Recommendations go to the session's save scope; sessions pick them up on
+    their next rerun.
+    """
+    namespace = current_write_namespace()
+    if namespace is None:
+        st.error("Enter your name or team in the sidebar to import into that scope")
+        return False
+    try:
+        author = current_author()
+        records = ((k, v, author, None) for k, v in read_recommendation_records(source)
+                   if k.endswith(RECOMMENDATION_SUFFIX))
+        get_backend().import_records(records, progress, namespace)
         return True
     except Exception as e:
         st.error(f"Error importing recommendations: {str(e)}")
         return False
 
 def init_recommendations():
-    """Initialize recommendations from storage when app starts"""
-    # Load saved recommendations
-    saved_recommendations = load_recommendations()
-    
-    # Update session state with saved values
-    for k, v in saved_recommendations.items():
-        if k.endswith("_recommendation"):
-            st.session_state[k] = v
-            
+    """
+    Bring session state up to date with the stored recommendations on every rerun.
+
+    Recommendations are resolved across the session's namespaces (personal over
+    team over shared). The store's change feed is polled and only the cards it
+    lists are re-read in this process, and only keys changed since this
+    session's previous run are copied.
+    """
+    namespaces = current_namespaces()
+    try:
+        cache = get_cache(namespaces)
+        # A consistent snapshot: other sessions' refreshes swap in new dicts rather than change this one
+        generation, saved_recommendations = cache.refresh()
+    except Exception as e:
+        st.warning(f"Could not load recommendations: {str(e)}")
+        return {}
+
+    # A session that switched user or team, or whose cache was dropped and rebuilt
+    # with new generation numbers, starts over from the new view
+    seen_cache, seen = st.session_state.get(GENERATION_KEY, (None, 0))
+    if seen_cache is not cache:
+        seen = 0
+    if seen != generation:
+        changed = cache.changed_since(seen)
+        keys = saved_recommendations.keys() if changed is None else changed
+        if seen_cache is not None and seen_cache.namespaces != cache.namespaces:
+            # Text saved in the previous view only, such as the old user's personal text, must not stay on the cards
+            for k in [k for k in st.session_state
+                      if k.endswith(RECOMMENDATION_SUFFIX) and k not in saved_recommendations]:
+                del st.session_state[k]
+        # Update session state with saved values
+        for k in keys:
+            if k.endswith(RECOMMENDATION_SUFFIX) and k in saved_recommendations:
+                st.session_state[k] = saved_recommendations[k]
+        st.session_state[GENERATION_KEY] = (cache, generation)
+
     return saved_recommendations
 
-def save_recommendation(key, value):
-    """Save a single recommendation both to session state and persistent storage"""
+def sync_recommendation(key):
+    """
+    Return the latest saved text of one recommendation, picking up saves made by other sessions.
+
+    Cheap enough to poll from every card on a timer: when nothing changed it costs
+    one read of the store's change feed, and otherwise only the changed cards
+    are re-read and copied into session state.
+    """
+    init_recommendations()
+    return st.session_state.get(key)
+
+def recommendation_history(key, limit=None):
+    """
+    Return the saved versions of one recommendation in the session's save scope, newest first.
+
+    Versions are kept in session state and only read again once the store's change
+    feed lists the card, so a card showing its history can poll it cheaply.
+    """
+    namespace = current_write_namespace() or SHARED_NAMESPACE
+    try:
+        backend = get_backend()
+        cursor, read = st.session_state.get(HISTORY_KEY, (None, {}))
+        cursor, changes = backend.changes_since(cursor)
+        if changes is None:
+            read = {}
+        else:
+            changed = {tuple(change) for change in changes}
+            read = {entry: versions for entry, versions in read.items() if entry[:2] not in changed}
+        entry = (namespace, key, limit)
+        if entry not in read:
+            read[entry] = backend.history(key, limit, namespace)
+        st.session_state[HISTORY_KEY] = (cursor, read)
+        return read[entry]
+    except Exception as e:
+        st.warning(f"Could not load recommendation history: {str(e)}")
+        return []
+
+def index_insights(insights):
+    """Add the generated insight text of chart cards, keyed like their recommendations, to the search index"""
+    try:
+        get_backend().put_insights(insights.items())
+        return True
+    except Exception as e:
+        st.warning(f"Could not index insights for search: {str(e)}")
+        return False
+
+def search_recommendations(query, limit=20):
+    """Return the chart cards whose recommendation or generated insight matches `query`, saved recommendations first"""
+    try:
+        return get_backend().search(query, limit, current_namespaces())
+    except Exception as e:
+        st.warning(f"Could not search recommendations: {str(e)}")
+        return []
+
+def save_recommendation(key, value, snapshot=None):
+    """
+    Save a single recommendation both to session state and persistent storage.
+
+    The recommendation goes to the session's save scope and is recorded as a new
+    version with the session's author and, when given, the snapshot of the data
+    the recommendation refers to.
+    """
+    namespace = current_write_namespace()
+    if namespace is None:
+        st.error("Enter your name or team in the sidebar to save to that scope")
+        return False
+
     # Update session state
     st.session_state[key] = value
-    
-    # Load current recommendations and update
-    recommendations = load_recommendations()
-    recommendations[key] = value
-    
-    # Save back to file
-    return save_recommendations(recommendations)
+
+    # Queue just this recommendation; it reaches the store on the next background flush
+    try:
+        backend = get_backend()
+        backend.put(key, value, author=current_author(), snapshot=snapshot, namespace=namespace)
+        if backend.last_error is not None:
+            st.warning(f"Recent recommendations are not yet stored and will be retried: {str(backend.last_error)}")
+        return True
+    except Exception as e:
+        st.error(f"Could not save recommendation: {str(e)}")
+        return False
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Synthetic metric holding each category's combined head count across both cohorts
+COHORT_TOTAL = 'Cohort Total'
+
+def compute_sheet_statistics(df):
+    """
+    Compute a compact statistics table for every numeric metric column of a sheet.
+
+    The table maps each column name to its min, max, mean, sum, count of non-empty
+    values, the categories holding the max and min, how many categories are above
+    the mean, per-category values and ranks (1 = highest), and a sorted rank index of
+    row positions from highest to lowest value (empty values last). All columns are
+    reduced together with numpy, so insight text can be built from dictionary
+    lookups instead of repeated pandas passes. Columns without any values are left
+    out of the table.
+    """
+    categories = df['Category'].tolist()
+    metrics = df.drop(columns='Category').select_dtypes('number')
+
+    # Combined head count of the two cohort columns, as used by the distribution chart
+    if metrics.shape[1] >= 2:
+        metrics = metrics.assign(**{COHORT_TOTAL: metrics.iloc[:, :2].sum(axis=1)})
+
+    values = metrics.to_numpy(dtype=float)
+    has_values = ~np.isnan(values).all(axis=0) if len(values) else np.zeros(values.shape[1], dtype=bool)
+    columns = metrics.columns[has_values]
+    values = values[:, has_values]
+    if not len(columns):
+        return {}
+
+    minimums = np.nanmin(values, axis=0)
+    maximums = np.nanmax(values, axis=0)
+    means = np.nanmean(values, axis=0)
+    sums = np.nansum(values, axis=0)
+    counts = (~np.isnan(values)).sum(axis=0)
+    argmaxes = np.nanargmax(values, axis=0)
+    argmins = np.nanargmin(values, axis=0)
+    above_mean = (values > means).sum(axis=0)
+    ranks = metrics[columns].rank(ascending=False, method='min').to_numpy()
+    # Stable descending sort; NaN sorts last because -NaN is still NaN
+    orders = np.argsort(-values, axis=0, kind='stable')
+
+    table = {}
+    for j, column in enumerate(columns):
+        table[column] = {
+            'min': float(minimums[j]),
+            'max': float(maximums[j]),
+            'mean': float(means[j]),
+            'sum': float(sums[j]),
+            'count': int(counts[j]),
+            'argmax': categories[argmaxes[j]],
+            'argmin': categories[argmins[j]],
+            'above_mean': int(above_mean[j]),
+            'values': dict(zip(categories, values[:, j].tolist())),
+            'rank': dict(zip(categories, ranks[:, j].tolist())),
+            'order': orders[:, j].tolist()
+        }
+    return table
@@ -4,10 +4,36 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 import sys
-from recommendation_storage import init_recommendations, save_recommendation, export_recommendations, import_recommendations
+import difflib
+import html
+from datetime import datetime
+from recommendation_storage import (init_recommendations, save_recommendation, export_recommendations, import_recommendations,
+                                    category_recommendations, recommendation_history, index_insights,
+                                    search_recommendations, sync_recommendation, AUTHOR_KEY, TEAM_KEY, SCOPE_KEY,
+                                    SAVE_SCOPES, CHANGE_POLL_INTERVAL)
+from chart_export import build_chart_bundle
+from chart_style import init_chart_style, warm_up
+from sheet_statistics import compute_sheet_statistics
+from insight_templates import generate_insight, dataset_version, INSIGHT_BUILDERS
+from derived_metrics import (compute_derived_metrics, COHORT_SHARE_LRM, COHORT_SHARE_12, COMBINED_KPI_PCT,
+                             KPI1_PCT, COMBINED_PERFORMANCE_GAP, KPI1_PERFORMANCE_GAP, ATTRITION_RATE,
+                             RESIDENCY_PCT_DIFF, INFANT_ATTRITION_PCT, INFANT_ATTRITION_POSITION)
+from aadhar_data import METRIC_NAMES
+from metric_comparison import build_metric_table, compare_metric, rank_segments, DIMENSION, CATEGORY, VALUE
+from category_ranking import top_n_categories, OTHER_CATEGORY
+from zone_hierarchy import build_zone_rollups, child_level, NATIONAL
+from anomaly_detection import flag_anomalies, flagged_cells, anomaly_insight, DEFAULT_THRESHOLD
+from history_store import list_snapshots, load_trend
+from what_if import simulate, impact_summary, ADJUSTABLE_METRICS, POINT_METRICS
 
-# Set seaborn style
-sns.set_theme(style="whitegrid")
+# Apply the chart theme and pre-warm fonts and the Agg backend once per server process
+warm_up()
+
+# Session-state key of the data version whose insights this session has added to the search index
+INSIGHT_INDEX_KEY = 'insight_index_version'
+
+# Session-state key of the anomaly panel's threshold, which also decides the anomaly notes on the charts
+ANOMALY_THRESHOLD_KEY = 'anomaly_threshold'
 def main():    # Set page configuration
     st.set_page_config(
         page_title="Aadhar Analysis Dashboard",
@@ -17,6 +43,11 @@ def main():    # Set page configuration
     
     # Initialize session state for storing recommendations from persistent storage
     init_recommendations()
+    st.sidebar.text_input("Your name", key=AUTHOR_KEY, help="Recorded with every recommendation you save")
+    st.sidebar.text_input("Your team", key=TEAM_KEY)
+    st.sidebar.radio("Save recommendations to:", SAVE_SCOPES, key=SCOPE_KEY,
+                     help="Personal recommendations are shown only to you and override your team's, "
+                          "which override the shared ones")
     
     st.markdown("""
         <div style='text-align: center; margin-bottom: 40px;'>
@@ -81,14 +112,31 @@ def main():    # Set page configuration
             # Find the corresponding dataframe
             selected_df = next(data for data in all_dataframes if data["name"] == category)
             
+            # Unusual values across every metric and category of every sheet, scored once at the
+            # panel's threshold so the panel and the chart notes always flag the same cells
+            sheets = {data["name"]: data["df"] for data in all_dataframes}
+            anomalies = get_anomalies(sheets, st.session_state.get(ANOMALY_THRESHOLD_KEY, DEFAULT_THRESHOLD))
+            
             # Create the dashboard for the selected category
-            create_dashboard(selected_df["df"], selected_df["name"])
+            create_dashboard(selected_df["df"], selected_df["name"], anomalies)
+            
+            # Compare a single metric across every loaded category sheet
+            create_comparison_view(sheets)
+            
+            # Flag unusual values across every metric and category of every sheet
+            create_anomaly_panel(anomalies)
+            
+            # Trends of a metric over the stored monthly snapshots
+            create_trend_view([data["name"] for data in all_dataframes])
+            
+            # Find chart cards across every category by the words in their recommendations and insights
+            create_search_view(sheets)
                     
         except Exception as e:
             st.error(f"Error loading data: {str(e)}")
             st.exception(e)  # This will display the full traceback
 
-def create_dashboard(df, name):
+def create_dashboard(df, name, anomalies):
     """Create a dashboard visualization for the given dataframe in Streamlit."""
     st.markdown(f"<h1 style='text-align: center; font-weight: 800; color: #0A2472; margin-bottom: 20px; text-shadow: 1px 1px 2px #ccc;'>{name} Analysis Dashboard</h1>", unsafe_allow_html=True)
     
@@ -104,10 +152,16 @@ def create_dashboard(df, name):
                     st.success(f"Recommendations exported to {filename}")
         
         with col2:
-            # Import button - load recommendations from file
-            uploaded_file = st.file_uploader("Import recommendations from JSON", type="json")
-            if uploaded_file is not None:
-                if import_recommendations(uploaded_file.getvalue().decode('utf-8')):
+            # Import button - stream recommendations from an exported file into the store
+            uploaded_file = st.file_uploader("Import recommendations (JSON Lines or JSON)", type=["jsonl", "json"])
+            # The uploader keeps its file across reruns; import each upload only once
+            if uploaded_file is not None and st.session_state.get('imported_recommendations_file') != uploaded_file.file_id:
+                progress_bar = st.progress(0.0, text="Importing recommendations...")
+                def show_progress(count):
+                    progress_bar.progress(min(uploaded_file.tell() / max(uploaded_file.size, 1), 1.0),
+                                          text=f"Imported {count} recommendations...")
+                if import_recommendations(uploaded_file, show_progress):
+                    st.session_state['imported_recommendations_file'] = uploaded_file.file_id
                     st.success("Recommendations imported successfully!")
                     st.rerun()  # Refresh the UI to show imported recommendations
     
@@ -120,27 +174,38 @@ def create_dashboard(df, name):
         st.markdown("<div style='background-color: #e1f5fe; padding: 15px; border-radius: 10px; margin-bottom: 20px; border: 1px solid #81d4fa;'>", unsafe_allow_html=True)
         st.markdown("<h3 style='color: #0277bd;'>📍 Zone Selection</h3>", unsafe_allow_html=True)
         
-        # Get unique zones
-        all_zones = sorted(df['Category'].unique())
+        zone_view = st.radio('Zone view:', ['Compare zones', 'Drill down by region'], horizontal=True)
         
-        # Allow the user to select zones
-        selected_zones = st.multiselect(
-            'Select zones to compare:',
-            options=all_zones,
-            default=all_zones[:3] if len(all_zones) > 3 else all_zones,  # Default to first 3 zones or all if fewer
-            help="Select up to 10 zones to compare in the charts"
-        )
-        
-        # Filter the dataframe based on selected zones
-        if selected_zones:
-            filtered_df = df[df['Category'].isin(selected_zones)]
-            st.success(f"Showing data for {len(selected_zones)} selected zones")
+        if zone_view == 'Drill down by region':
+            # Each drill step is a lookup into the precomputed regional roll-ups
+            filtered_df, level, path = select_zone_rollup(df)
+            st.success(f"Showing {len(filtered_df)} {level.lower()} rows under {' › '.join(path)}; "
+                       "rates are weighted by cohort head count")
         else:
-            st.warning("Please select at least one zone to display data")
-            return
+            # Get unique zones
+            all_zones = sorted(df['Category'].unique())
+            
+            # Allow the user to select zones
+            selected_zones = st.multiselect(
+                'Select zones to compare:',
+                options=all_zones,
+                default=all_zones[:3] if len(all_zones) > 3 else all_zones,  # Default to first 3 zones or all if fewer
+                help="Select up to 10 zones to compare in the charts"
+            )
+            
+            # Filter the dataframe based on selected zones
+            if selected_zones:
+                filtered_df = df[df['Category'].isin(selected_zones)]
+                st.success(f"Showing data for {len(selected_zones)} selected zones")
+            else:
+                st.warning("Please select at least one zone to display data")
+                return
             
         st.markdown("</div>", unsafe_allow_html=True)
-    
+
+    # Optionally limit the charts to the top/bottom N categories, collapsing the rest into "Other"
+    filtered_df = select_top_categories(filtered_df, name)
+
     # Enable user to select which charts to display with improved styling
     st.markdown("<div style='background-color: #f0f2f6; padding: 15px; border-radius: 10px; margin-bottom: 20px;'>", unsafe_allow_html=True)
     selected_charts = st.multiselect(
@@ -152,18 +217,20 @@ def create_dashboard(df, name):
     )
     st.markdown("</div>", unsafe_allow_html=True)
     
-    # Create a list of chart creation functions
-    chart_functions = {
-        'Distribution': create_distribution_chart,
-        'KPI Performance': create_kpi_performance_chart,
-        'Performance Multiple': create_performance_multiple_chart,
-        'Top vs Bottom Performers': create_top_bottom_performers_chart,
-        'Time to First Sale': create_time_to_first_sale_chart,
-        'CAR2CATPO Ratio': create_car2catpo_ratio_chart,
-        'Attrition Count': create_attrition_count_chart,
-        'Average Residency': create_average_residency_chart,
-        'Infant Attrition': create_infant_attrition_chart 
-    }
+    # Download the selected charts, data and recommendations as one zip bundle
+    render_bundle_download(filtered_df, name, selected_charts)
+    
+    # Statistics and derived metrics shared by every chart, computed once per sheet selection
+    stats = get_sheet_statistics(filtered_df)
+    derived = get_derived_metrics(filtered_df)
+    # Flags of this sheet's categories still shown after filtering
+    anomalies = anomalies[(anomalies.index.get_level_values(DIMENSION) == name)
+                          & anomalies.index.get_level_values(CATEGORY).isin(filtered_df['Category'])]
+    
+    # Content hash of the data shown, computed once for every chart's insight cache;
+    # its short form is recorded with every saved recommendation
+    version = dataset_version(filtered_df)
+    snapshot = version[:12]
     
     # Organize charts into rows with equal heights
     # Determine how many rows we need (3 charts per row)
@@ -191,7 +258,14 @@ def create_dashboard(df, name):
                                     <div style='padding: 10px 0;'>
                             """, unsafe_allow_html=True)
                             # Call the chart function that returns insights
-                            chart, auto_insights = chart_functions[chart_name](filtered_df, name)
+                            chart, auto_insights = CHART_FUNCTIONS[chart_name](filtered_df, name, stats, derived, version)
+                            
+                            # Mention any categories flagged as unusual on this chart's metrics
+                            anomaly_note = anomaly_insight(anomalies, CHART_METRICS[chart_name])
+                            if anomaly_note:
+                                auto_insights = f"{auto_insights} {anomaly_note}"
+                            st.pyplot(chart, use_container_width=True)
+                            plt.close(chart)
                             
                             # Create a unique key for each text input based on category and chart
                             input_key = f"{name}_{chart_name}_recommendation"
@@ -200,35 +274,344 @@ def create_dashboard(df, name):
                             if input_key not in st.session_state:
                                 st.session_state[input_key] = auto_insights
                             
-                            # Add text area for custom recommendations
-                            st.markdown("<h4 style='margin: 10px 15px 5px 15px; color: #444;'>Your Recommendation:</h4>", unsafe_allow_html=True)
-                            custom_insight = st.text_area(
-                                "Enter your custom recommendation:",
-                                value=st.session_state.get(input_key, auto_insights),
-                                height=100,
-                                key=f"textarea_{input_key}",
-                                label_visibility="collapsed"
-                            )
-                            
-                            # Save button for the recommendation
-                            if st.button("Save Recommendation", key=f"save_{input_key}"):
-                                save_recommendation(input_key, custom_insight)
-                                st.success("Recommendation saved and will persist between sessions!")
-                            
-                            # Display the saved recommendation
-                            st.markdown(f"""
-                                <div style='padding: 10px 15px; background-color: #f8f9fa; border-top: 1px solid #e0e0e0; 
-                                margin-top: 5px; font-size: 14px; color: #333; border-radius: 0 0 8px 8px;'>
-                                    <strong>Key Insights:</strong><br>
-                                    {st.session_state.get(input_key, auto_insights)}
-                                </div>
-                            """, unsafe_allow_html=True)
+                            # Recommendation text, save button and history, refreshed on their own
+                            render_recommendation_card(input_key, auto_insights, snapshot)
                             
                             st.markdown("</div></div>", unsafe_allow_html=True)
                     except Exception as e:
                         st.error(f"Error generating {chart_name} chart: {str(e)}")
 
-def create_distribution_chart(df, name):
+    # What-if simulation on top of the charts shown above
+    create_what_if_panel(filtered_df, name)
+
+@st.fragment(run_every=CHANGE_POLL_INTERVAL)
+def render_recommendation_card(input_key, auto_insights, snapshot):
+    """Show a card's recommendation box, polling for saves made in other sessions."""
+    # Runs as a fragment: a save elsewhere refreshes this card only, not the whole dashboard
+    saved = sync_recommendation(input_key) or auto_insights
+    textarea_key = f"textarea_{input_key}"
+    shown_key = f"shown_{input_key}"
+    # Put newly saved text in the box unless it holds edits not yet saved
+    shown = st.session_state.get(shown_key)
+    if st.session_state.get(textarea_key, shown) == shown:
+        st.session_state[textarea_key] = saved
+    st.session_state[shown_key] = saved
+    
+    # Add text area for custom recommendations
+    st.markdown("<h4 style='margin: 10px 15px 5px 15px; color: #444;'>Your Recommendation:</h4>", unsafe_allow_html=True)
+    custom_insight = st.text_area(
+        "Enter your custom recommendation:",
+        height=100,
+        key=textarea_key,
+        label_visibility="collapsed"
+    )
+    
+    # Save button for the recommendation
+    if st.button("Save Recommendation", key=f"save_{input_key}"):
+        if save_recommendation(input_key, custom_insight, snapshot):
+            st.session_state[shown_key] = custom_insight
+            st.success("Recommendation saved and will persist between sessions!")
+    
+    # Earlier versions of this recommendation, each compared with the one before
+    if st.toggle("Show history", key=f"history_{input_key}"):
+        render_recommendation_history(input_key, snapshot)
+    
+    # Display the saved recommendation
+    st.markdown(f"""
+        <div style='padding: 10px 15px; background-color: #f8f9fa; border-top: 1px solid #e0e0e0; 
+        margin-top: 5px; font-size: 14px; color: #333; border-radius: 0 0 8px 8px;'>
+            <strong>Key Insights:</strong><br>
+            {st.session_state.get(input_key, saved)}
+        </div>
+    """, unsafe_allow_html=True)
+
+def render_recommendation_history(key, snapshot, limit=10):
+    """Show the latest saved versions of one recommendation with a diff against the previous version."""
+    # One version more than shown, to diff the oldest shown one against
+    versions = recommendation_history(key, limit + 1)
+    if not versions:
+        st.caption("No saved versions yet.")
+        return
+    for newer, older in zip(versions[:limit], versions[1:limit + 1] + [None]):
+        data_note = "current data" if newer['snapshot'] == snapshot else f"data {newer['snapshot'] or 'unknown'}"
+        st.markdown(f"**v{newer['version']}** · {newer['author'] or 'unknown'} · {newer['created_at']} · {data_note}")
+        if older is None:
+            st.text(newer['value'])
+            continue
+        diff = difflib.unified_diff(
+            older['value'].splitlines(), newer['value'].splitlines(),
+            f"v{older['version']}", f"v{newer['version']}", lineterm=''
+        )
+        st.code("\n".join(diff) or "(no text changes)", language='diff')
+    if len(versions) > limit:
+        # Versions are numbered from 1, so the oldest one shown tells how many are older
+        st.caption(f"{versions[limit - 1]['version'] - 1} older versions not shown.")
+
+@st.cache_data(show_spinner=False)
+def get_sheet_statistics(df):
+    """Return the statistics table of a sheet, cached across reruns for the same data."""
+    return compute_sheet_statistics(df)
+
+@st.cache_data(show_spinner=False)
+def get_derived_metrics(df):
+    """Return the derived metrics of a sheet, cached across reruns for the same data."""
+    return compute_derived_metrics(df)
+
+@st.cache_data(show_spinner=False)
+def get_zone_rollups(df):
+    """Return the precomputed national, regional and city roll-ups of the Zone sheet."""
+    return build_zone_rollups(df)
+
+def select_zone_rollup(df):
+    """Let the user drill down the zone hierarchy, returning the selected rows, their level and path."""
+    rollups = get_zone_rollups(df)
+    parent, level = NATIONAL, child_level(NATIONAL)
+    path = [NATIONAL]
+    
+    # Offer one selectbox per level until the user stops at "All" or reaches the cities
+    while True:
+        children = rollups[(level, parent)]
+        below = child_level(level)
+        if below is None:
+            break
+        choice = st.selectbox(f'{level}:', [f'All {level.lower()}s'] + children['Category'].tolist(),
+                              key=f"zone_drill_{level}")
+        if choice not in children['Category'].values:
+            break
+        parent, level = choice, below
+        path.append(choice)
+    return children, level, path
+
+@st.fragment
+def create_what_if_panel(df, name):
+    """Let the user adjust metrics for chosen categories and re-render only the affected charts."""
+    # Runs as a fragment: moving a slider reruns this panel only, not the whole dashboard
+    with st.expander("🔮 What-If Simulator"):
+        col1, col2 = st.columns(2)
+        with col1:
+            categories = st.multiselect('Categories to adjust:', df['Category'].tolist(), key=f"{name}_whatif_categories")
+        with col2:
+            metric_names = [metric for metric in ADJUSTABLE_METRICS if metric in METRIC_NAMES[:len(df.columns) - 1]]
+            metrics = st.multiselect('Metrics to adjust:', metric_names, key=f"{name}_whatif_metrics")
+        
+        if not categories or not metrics:
+            st.info("Choose categories and metrics to simulate a change")
+            return
+        
+        changes = {}
+        slider_cols = st.columns(min(len(metrics), 3))
+        for i, metric in enumerate(metrics):
+            with slider_cols[i % len(slider_cols)]:
+                if metric in POINT_METRICS:
+                    changes[metric] = st.slider(f'{metric} (change in % points)', -20.0, 20.0, 0.0, 0.5,
+                                                key=f"{name}_whatif_{metric}")
+                else:
+                    changes[metric] = st.slider(f'{metric} (change in %)', -50, 50, 0, 1,
+                                                key=f"{name}_whatif_{metric}")
+        
+        simulated, changed = simulate(df, categories, changes)
+        if not changed:
+            st.info("Move a slider to see the simulated impact")
+            return
+        
+        st.markdown("**Simulated impact**")
+        st.dataframe(impact_summary(df, simulated, categories, changed), hide_index=True, use_container_width=True)
+        
+        # Re-render only the charts that draw a changed metric
+        affected = [chart_name for chart_name, chart_metrics in CHART_METRICS.items()
+                    if any(metric in changed for metric in chart_metrics)]
+        stats = compute_sheet_statistics(simulated)
+        derived = compute_derived_metrics(simulated)
+        version = dataset_version(simulated)
+        cols = st.columns(min(len(affected), 3))
+        for i, chart_name in enumerate(affected):
+            with cols[i % len(cols)]:
+                chart, insights = CHART_FUNCTIONS[chart_name](simulated, name, stats, derived, version)
+                st.markdown(f"<h4 style='text-align: center; color: #0A2472;'>{chart_name} (simulated)</h4>", unsafe_allow_html=True)
+                st.pyplot(chart, use_container_width=True)
+                plt.close(chart)
+                st.caption(insights)
+
+def select_top_categories(df, name):
+    """Let the user show only the top or bottom N categories, with the rest aggregated as "Other"."""
+    # Small sheets are always shown in full
+    if len(df) <= 5:
+        return df
+
+    # Rank by any metric column that has values, using its precomputed rank index
+    stats = get_sheet_statistics(df)
+    metric_columns = {metric: column for metric, column in zip(METRIC_NAMES, df.columns[1:]) if column in stats}
+    
+    with st.expander("🏆 Top/Bottom Categories"):
+        col1, col2, col3 = st.columns([1, 2, 2])
+        with col1:
+            mode = st.radio('Show:', ['All', 'Top N', 'Bottom N'], key=f"{name}_rank_mode")
+        with col2:
+            metric = st.selectbox('Rank categories by:', list(metric_columns), key=f"{name}_rank_metric")
+        with col3:
+            n = st.slider('Number of categories (N):', min_value=1, max_value=len(df) - 1,
+                          value=min(5, len(df) - 1), key=f"{name}_rank_n")
+            collapse_rest = st.checkbox(f'Collapse the rest into "{OTHER_CATEGORY}"', value=True,
+                                        key=f"{name}_rank_other")
+
+    if mode == 'All':
+        return df
+
+    ranked_df = top_n_categories(df, stats, metric_columns[metric], n,
+                                 bottom=(mode == 'Bottom N'), other=collapse_rest)
+    shown = len(ranked_df) - 1 if collapse_rest else len(ranked_df)
+    st.success(f"Showing the {mode.split()[0].lower()} {shown} {name} categories by {metric}"
+               + (f", with {len(df) - shown} more aggregated as \"{OTHER_CATEGORY}\"" if collapse_rest else ""))
+    return ranked_df
+
+@st.cache_data(show_spinner=False)
+def get_metric_table(sheets):
+    """Return the long cross-category metric table, cached across reruns for the same sheets."""
+    return build_metric_table(sheets)
+
+def create_comparison_view(sheets):
+    """Compare one metric across the categories of every sheet, or rank all segments by it."""
+    st.markdown("<h2 style='text-align: center; font-weight: 700; color: #0A2472; margin: 30px 0 10px 0;'>Cross-Category Comparison</h2>", unsafe_allow_html=True)
+    
+    table = get_metric_table(sheets)
+    col1, col2, col3 = st.columns([2, 3, 1])
+    with col1:
+        metric = st.selectbox('Metric to compare:', METRIC_NAMES, index=METRIC_NAMES.index('Infant Attrition'))
+    with col2:
+        dimensions = st.multiselect('Categories to include:', list(sheets), default=list(sheets))
+    with col3:
+        lowest_first = st.checkbox('Lowest first', value=False)
+    
+    if not dimensions:
+        st.warning("Please select at least one category to compare")
+        return
+    
+    ranking = rank_segments(table, metric, dimensions, ascending=lowest_first)
+    if ranking.empty:
+        st.info(f"No {metric} values are available for the selected categories")
+        return
+    
+    fig = create_metric_comparison_chart(ranking, metric)
+    st.pyplot(fig, use_container_width=True)
+    plt.close(fig)
+    
+    # Summary per dimension alongside the full segment ranking
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Segment ranking**")
+        st.dataframe(ranking, hide_index=True, use_container_width=True)
+    with col2:
+        st.markdown("**Summary by category**")
+        summary = compare_metric(table, metric, dimensions).groupby(DIMENSION)[VALUE].agg(['min', 'mean', 'max', 'count'])
+        st.dataframe(summary, use_container_width=True)
+
+@st.cache_data(show_spinner=False)
+def get_anomalies(sheets, threshold=DEFAULT_THRESHOLD):
+    """Return the robust z-scores and anomaly flags of every sheet, cached across reruns."""
+    return flag_anomalies(build_metric_table(sheets), threshold)
+
+def create_anomaly_panel(anomalies):
+    """List every value that stands out from the other categories of its sheet."""
+    with st.expander("🚩 Anomalies Across All Categories"):
+        # Moving the slider reruns the app, which scores the sheets again at the new threshold
+        st.slider('Robust z-score threshold:', min_value=2.0, max_value=6.0,
+                  value=DEFAULT_THRESHOLD, step=0.5, key=ANOMALY_THRESHOLD_KEY,
+                  help="Values further than this from the median (in robust standard deviations) are flagged")
+        cells = flagged_cells(anomalies)
+        if cells.empty:
+            st.info("No values exceed the threshold")
+            return
+        
+        st.markdown(f"**{len(cells)} flagged values**, most extreme first")
+        st.dataframe(cells, hide_index=True, use_container_width=True)
+
+@st.cache_data(show_spinner=False)
+def get_trend(metric, dimension, snapshots):
+    """Return a metric's trend per category, cached until a new snapshot is stored."""
+    return load_trend(metric, dimension)
+
+def create_trend_view(dimensions):
+    """Chart one metric per category across the monthly snapshots in the history store."""
+    snapshots = tuple(list_snapshots())
+    with st.expander(f"📈 Trends Over Time ({len(snapshots)} snapshots)"):
+        if not snapshots:
+            st.info("No snapshots stored yet. Add the current workbook with: python history_store.py ingest --date YYYY-MM-DD")
+            return
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            dimension = st.selectbox('Category sheet:', dimensions, key="trend_dimension")
+        with col2:
+            metric = st.selectbox('Metric:', METRIC_NAMES, key="trend_metric")
+        
+        trend = get_trend(metric, dimension, snapshots)
+        categories = st.multiselect('Categories:', trend.columns.tolist(), default=trend.columns.tolist()[:8],
+                                    key="trend_categories")
+        if not categories:
+            st.warning("Please select at least one category to display")
+            return
+        
+        fig, ax = setup_chart_style()
+        for category in categories:
+            ax.plot(trend.index, trend[category], marker='o', linewidth=2.5, label=category)
+        ax.set_title(f'{metric} by {dimension} Over Time', pad=20)
+        ax.set_xlabel('Snapshot', labelpad=15)
+        ax.set_ylabel(metric, labelpad=15)
+        ax.grid(linestyle='--', alpha=0.7)
+        ax.legend(loc='best')
+        fig.autofmt_xdate()
+        plt.tight_layout(pad=3.0)
+        st.pyplot(fig, use_container_width=True)
+        plt.close(fig)
+
+def create_metric_comparison_chart(ranking, metric):
+    """Create a horizontal bar chart of one metric for every ranked segment, colored by dimension."""
+    fig, ax = setup_chart_style()
+    
+    chart_data = ranking.assign(Segment=ranking[DIMENSION] + ': ' + ranking[CATEGORY])
+    sns.barplot(x=VALUE, y='Segment', data=chart_data, hue=DIMENSION, dodge=False, ax=ax, orient='h')
+    
+    ax.set_title(f'{metric} by Segment', pad=20)
+    ax.set_xlabel(metric, labelpad=15)
+    ax.set_ylabel('')
+    ax.grid(axis='x', linestyle='--', alpha=0.7)
+    ax.legend(title='Category', loc='lower right')
+    
+    # Value labels at the end of each bar
+    for container in ax.containers:
+        ax.bar_label(container, fmt='%.2f', padding=3, fontsize=10)
+    
+    plt.tight_layout(pad=3.0)
+    return fig
+
+def render_bundle_download(df, name, selected_charts):
+    """Build the selected charts into an in-memory zip and offer it for download."""
+    bundle_key = f"{name}_chart_bundle"
+    
+    if st.button("Prepare Chart Bundle (.zip)", key=f"prepare_{bundle_key}"):
+        if not selected_charts:
+            st.warning("Please select at least one visualization to include in the bundle")
+        else:
+            with st.spinner(f"Rendering {len(selected_charts)} charts..."):
+                chart_functions = {chart_name: CHART_FUNCTIONS[chart_name] for chart_name in selected_charts}
+                st.session_state[bundle_key] = build_chart_bundle(
+                    df, name, chart_functions, category_recommendations(name)
+                )
+    
+    # Offer the prepared bundle; it is dropped from session state once downloaded
+    if bundle_key in st.session_state:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        st.download_button(
+            "Download Chart Bundle",
+            data=st.session_state[bundle_key],
+            file_name=f"aadhar_{name}_charts_{timestamp}.zip",
+            mime="application/zip",
+            key=f"download_{bundle_key}",
+            on_click=st.session_state.pop,
+            args=(bundle_key, None)
+        )
+
+def create_distribution_chart(df, name, stats=None, derived=None, version=None):
     """Create the distribution chart."""
     fig, ax = setup_chart_style()
     
@@ -241,10 +624,10 @@ def create_distribution_chart(df, name):
                         var_name='Metric', 
                         value_name='Count')
 
-    # Calculate percentages for each cohort
-    for metric in [first_cols[1], first_cols[2]]:
-        total = df[metric].sum()
-        df_melted.loc[df_melted['Metric'] == metric, 'Percentage'] = df_melted.loc[df_melted['Metric'] == metric, 'Count'] / total * 100    
+    # Percentages for each cohort come from the derived metrics, in melted (cohort-major) order
+    if derived is None:
+        derived = compute_derived_metrics(df)
+    df_melted['Percentage'] = np.concatenate([derived[COHORT_SHARE_LRM].to_numpy(), derived[COHORT_SHARE_12].to_numpy()])
     
     # Using seaborn barplot with grouped bars and better colors
     bars = sns.barplot(x='Category', y='Count', hue='Metric', 
@@ -296,44 +679,11 @@ def create_distribution_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = ""
-    
-    # Find the category with the highest count for each metric
-    highest_cohort = df_melted.loc[df_melted.groupby('Metric')['Count'].idxmax()]
-    
-    # Find the category with the highest percentage
-    highest_pct_idx = df_melted['Percentage'].idxmax()
-    highest_pct = df_melted.iloc[highest_pct_idx]
-    
-    if name == "Gender":
-        male_data = df_melted[df_melted['Category'] == 'Male']
-        female_data = df_melted[df_melted['Category'] == 'Female']
-        
-        if not male_data.empty and not female_data.empty:
-            male_count = male_data['Count'].sum()
-            female_count = female_data['Count'].sum()
-            ratio = male_count / female_count if female_count > 0 else 0
-            
-            insights = f"The gender distribution shows a male-to-female ratio of {ratio:.2f}:1. "
-            insights += f"The {highest_pct['Category']} category shows the highest representation at {highest_pct['Percentage']:.1f}% for {highest_pct['Metric']}."
-        else:
-            insights = f"The {name} distribution shows that {highest_pct['Category']} has the highest representation at {highest_pct['Percentage']:.1f}% for {highest_pct['Metric']}."
-    else:
-        insights = f"The {name} distribution analysis shows that {highest_pct['Category']} has the highest representation at {highest_pct['Percentage']:.1f}% for {highest_pct['Metric']}. "
-        
-        # Calculate the spread between categories
-        unique_categories = df_melted['Category'].unique()
-        if len(unique_categories) > 1:
-            spread = df_melted.groupby('Category')['Count'].sum().max() - df_melted.groupby('Category')['Count'].sum().min()
-            insights += f"There is a difference of {int(spread)} employees between the largest and smallest {name} categories."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('Distribution', df, name, stats, version)
     return fig, insights
 
-def create_kpi_performance_chart(df, name):
+def create_kpi_performance_chart(df, name, stats=None, derived=None, version=None):
     """Create the KPI performance chart."""
     fig, ax = setup_chart_style()
     
@@ -345,11 +695,13 @@ def create_kpi_performance_chart(df, name):
     col4_short = "Cumulative Combined KPI"
     col8_short = "Cumulative KPI 1"
     
-    # Create a DataFrame with the data and specified columns, multiplying KPI values by 100 to show as percentages
+    # Create a DataFrame with the KPI values already converted to percentages by the derived metrics
+    if derived is None:
+        derived = compute_derived_metrics(df)
     kpi_data = pd.DataFrame({
         'Category': df['Category'],
-        col4_short: df[col4] * 100,  # Multiply by 100 to convert to percentage
-        col8_short: df[col8] * 100   # Multiply by 100 to convert to percentage
+        col4_short: derived[COMBINED_KPI_PCT],
+        col8_short: derived[KPI1_PCT]
     })
 
     # Reshape data for seaborn
@@ -459,111 +811,31 @@ def create_kpi_performance_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = ""
-    
-    # Find the category with the highest and lowest KPI values
-    highest_combined_idx = kpi_data[col4_short].idxmax()
-    lowest_combined_idx = kpi_data[col4_short].idxmin()
-    
-    highest_kpi1_idx = kpi_data[col8_short].idxmax()
-    lowest_kpi1_idx = kpi_data[col8_short].idxmin()
-    
-    # Calculate the average KPI values
-    avg_combined = kpi_data[col4_short].mean()
-    avg_kpi1 = kpi_data[col8_short].mean()
-    
-    # Generate insights
-    if name == "Gender":
-        # Compare male vs female performance
-        male_data = kpi_data[kpi_data['Category'] == 'Male']
-        female_data = kpi_data[kpi_data['Category'] == 'Female']
-        
-        if not male_data.empty and not female_data.empty:
-            male_combined = male_data[col4_short].values[0]
-            female_combined = female_data[col4_short].values[0]
-            
-            if male_combined > female_combined:
-                diff = male_combined - female_combined
-                insights = f"Male employees outperform female employees by {diff:.1f}% in combined KPI achievement. "
-            else:
-                diff = female_combined - male_combined
-                insights = f"Female employees outperform male employees by {diff:.1f}% in combined KPI achievement. "
-        
-        insights += f"The overall KPI achievement average is {avg_combined:.1f}%."
-    elif name == "Zone":
-        # For Zone, identify top and bottom performing zones
-        top_zone = kpi_data.loc[highest_combined_idx, 'Category']
-        bottom_zone = kpi_data.loc[lowest_combined_idx, 'Category']
-        top_value = kpi_data.loc[highest_combined_idx, col4_short]
-        bottom_value = kpi_data.loc[lowest_combined_idx, col4_short]
-        
-        insights = (f"{top_zone} is the top performing zone with {top_value:.1f}% combined KPI achievement. "
-                   f"{bottom_zone} shows the lowest performance at {bottom_value:.1f}%. "
-                   f"The performance gap is {top_value - bottom_value:.1f}% points. "
-                   f"The average combined KPI across selected zones is {avg_combined:.1f}%.")
-                   
-        # Add additional insight about performance distribution
-        above_avg = kpi_data[kpi_data[col4_short] > avg_combined]
-        perc_above_avg = len(above_avg) / len(kpi_data) * 100
-        
-        insights += f" {perc_above_avg:.0f}% of zones are performing above the average."
-    
-    else:
-        # Identify top and bottom performers
-        insights = f"The {kpi_data.loc[highest_combined_idx, 'Category']} {name} category has the highest combined KPI achievement at {kpi_data.loc[highest_combined_idx, col4_short]:.1f}%, "
-        insights += f"while {kpi_data.loc[lowest_combined_idx, 'Category']} has the lowest at {kpi_data.loc[lowest_combined_idx, col4_short]:.1f}%. "
-        
-        # Note any significant gaps
-        perf_gap = kpi_data.loc[highest_combined_idx, col4_short] - kpi_data.loc[lowest_combined_idx, col4_short]
-        if perf_gap > 10:
-            insights += f"There's a notable {perf_gap:.1f}% gap between the highest and lowest performing {name} categories."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('KPI Performance', df, name, stats, version)
     return fig, insights
 
 # Helper function to setup consistent chart styling
 def setup_chart_style():
-    """Set up consistent styling for all charts with executive-level polish."""
-    # Set global font size and weight - make everything bolder and more professional
-    plt.rcParams.update({
-        'font.size': 14,
-        'font.weight': 'bold',
-        'axes.titlesize': 20,
-        'axes.titleweight': 'bold',
-        'axes.labelsize': 16,
-        'axes.labelweight': 'bold',
-        'xtick.labelsize': 14,
-        'ytick.labelsize': 14,
-        'figure.constrained_layout.use': True,  # Use constrained layout for better spacing
-        'axes.grid': True,
-        'grid.alpha': 0.3,
-        'axes.spines.top': False,
-        'axes.spines.right': False,
-        'axes.edgecolor': '#333333',
-        'axes.linewidth': 1.5,
-        'figure.facecolor': '#ffffff',
-        'axes.facecolor': '#f9f9f9',
-    })
+    """Create a figure using the shared executive-level chart style."""
+    # The theme itself is applied once per process; this is a no-op after the first chart
+    style = init_chart_style()
     
     # Create figure with consistent size for all charts
-    # Using a fixed aspect ratio to ensure all charts have the same height
-    fig, ax = plt.subplots(figsize=(12, 8), dpi=120)  # Increased DPI for sharper images
+    fig, ax = plt.subplots(figsize=style.figsize, dpi=style.dpi)
     
     # Set figure face color to white for better appearance
-    fig.set_facecolor('white')
+    fig.set_facecolor(style.figure_facecolor)
     
     # Adjust the bottom margin to create more space for x-axis labels
-    plt.subplots_adjust(bottom=0.15)
+    plt.subplots_adjust(bottom=style.bottom_margin)
     
     # Add a subtle background color to enhance readability
-    ax.set_facecolor('#f9f9f9')
+    ax.set_facecolor(style.axes_facecolor)
     
     # Add a border to the figure for a more polished look
-    fig.patch.set_edgecolor('#e0e0e0')
-    fig.patch.set_linewidth(2)
+    fig.patch.set_edgecolor(style.figure_edgecolor)
+    fig.patch.set_linewidth(style.figure_linewidth)
     
     return fig, ax
 
@@ -574,7 +846,7 @@ def extend_y_limits(ax, top_extension=0.2):
     ax.set_ylim(y_min, y_max + y_range * top_extension)
     return ax
 
-def create_performance_multiple_chart(df, name):
+def create_performance_multiple_chart(df, name, stats=None, derived=None, version=None):
     """Create the performance multiple chart."""
     fig, ax = setup_chart_style()
     
@@ -648,56 +920,11 @@ def create_performance_multiple_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = ""
-    
-    # Find the best and worst performing categories
-    best_combined_idx = perf_data[col7_short].idxmax()
-    best_combined_category = perf_data.loc[best_combined_idx, 'Category']
-    best_combined_multiple = perf_data.loc[best_combined_idx, col7_short]
-    
-    worst_combined_idx = perf_data[col7_short].idxmin()
-    worst_combined_category = perf_data.loc[worst_combined_idx, 'Category']
-    worst_combined_multiple = perf_data.loc[worst_combined_idx, col7_short]
-    
-    # Calculate the average multiple
-    avg_multiple = perf_data[col7_short].mean()
-    
-    # Generate insights
-    if name == "Gender":
-        # Compare male vs female performance multiples
-        male_data = perf_data[perf_data['Category'] == 'Male']
-        female_data = perf_data[perf_data['Category'] == 'Female']
-        
-        if not male_data.empty and not female_data.empty:
-            male_multiple = male_data[col7_short].values[0]
-            female_multiple = female_data[col7_short].values[0]
-            
-            ratio = male_multiple / female_multiple if female_multiple > 0 else 0
-            
-            if ratio > 1:
-                insights = f"Male employees show a {ratio:.2f}x higher performance multiple than female employees. "
-            else:
-                inverse_ratio = 1/ratio if ratio > 0 else 0
-                insights = f"Female employees show a {inverse_ratio:.2f}x higher performance multiple than male employees. "
-    else:
-        insights = f"The {best_combined_category} {name} category achieves the highest performance multiple at {best_combined_multiple:.1f}x, "
-        insights += f"while {worst_combined_category} has the lowest at {worst_combined_multiple:.1f}x. "
-        
-        # Add context about the average
-        insights += f"The overall average performance multiple is {avg_multiple:.1f}x across all {name} categories."
-        
-        # If there's a significant gap, highlight it
-        multiple_gap = best_combined_multiple / worst_combined_multiple if worst_combined_multiple > 0 else 0
-        if multiple_gap > 1.5:
-            insights += f" The top performing category is {multiple_gap:.1f}x more effective than the lowest."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('Performance Multiple', df, name, stats, version)
     return fig, insights
 
-def create_top_bottom_performers_chart(df, name):
+def create_top_bottom_performers_chart(df, name, stats=None, derived=None, version=None):
     """Create the top and bottom performers chart."""
     fig, ax = setup_chart_style()
     
@@ -712,10 +939,8 @@ def create_top_bottom_performers_chart(df, name):
         # Draw a simple placeholder chart with error message
         ax.text(0.5, 0.5, "Missing data columns for this chart", 
                 ha='center', va='center', fontsize=14, color='red')
-        st.pyplot(fig, use_container_width=True)
         
-        insights = f"Analysis of top and bottom performers across {name} categories reveals important performance trends. "
-        insights += f"The difference between top and bottom performers highlights opportunities for targeted training and development."
+        insights = generate_insight('Top vs Bottom Performers', df, name, stats, version)
         return fig, insights
     
     # Create shorter column names for display
@@ -788,6 +1013,20 @@ def create_top_bottom_performers_chart(df, name):
                    fontsize=base_fontsize,
                    fontweight='bold')
 
+    # Each bar averages the Combined and KPI 1 values, so the gap above a category
+    # averages the two top-bottom gaps from the derived metrics
+    if derived is None:
+        derived = compute_derived_metrics(df)
+    gaps = (derived[COMBINED_PERFORMANCE_GAP] + derived[KPI1_PERFORMANCE_GAP]) / 2
+    if len(ax.containers) >= 2:
+        for gap, top_bar, bottom_bar in zip(gaps, ax.containers[0], ax.containers[1]):
+            if pd.isna(gap):
+                continue
+            x_pos = (top_bar.get_x() + bottom_bar.get_x() + bottom_bar.get_width()) / 2
+            y_pos = max(top_bar.get_height(), bottom_bar.get_height())
+            ax.text(x_pos, y_pos, f'Gap {gap:.1f}', ha='center', va='bottom',
+                    fontsize=base_fontsize - 4, fontweight='bold')
+
     # Enhance grid for better readability
     ax.grid(axis='y', linestyle='--', alpha=0.7)
     
@@ -806,25 +1045,11 @@ def create_top_bottom_performers_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = f"Analysis of top and bottom performers across {name} categories reveals important performance trends. "
-    insights += f"The difference between top and bottom performers highlights opportunities for targeted training and development. "
-    
-    if name == "Gender":
-        insights += "Gender analysis of performance extremes may provide opportunities for more equitable development programs."
-    elif name == "Education":
-        insights += "Educational background appears to correlate with performance extremes, suggesting targeted development programs by education level."
-    elif name == "Experience":
-        insights += "Experience bands show varying performance distributions, indicating potential for experience-based mentoring initiatives."
-    elif name == "Age":
-        insights += "Age-based performance differences highlight opportunities for cross-generational skill transfers."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('Top vs Bottom Performers', df, name, stats, version)
     return fig, insights
     
-def create_time_to_first_sale_chart(df, name):
+def create_time_to_first_sale_chart(df, name, stats=None, derived=None, version=None):
     """Create the time to first sale chart."""
     fig, ax = setup_chart_style()
     
@@ -836,10 +1061,8 @@ def create_time_to_first_sale_chart(df, name):
         # Draw a simple placeholder chart with error message
         ax.text(0.5, 0.5, "Missing data column for time to first sale", 
                 ha='center', va='center', fontsize=14, color='red')
-        st.pyplot(fig, use_container_width=True)
         
-        insights = f"Time to first sale analysis across {name} categories reveals important onboarding efficiency patterns. "
-        insights += "Reducing time to productivity remains a key factor in improving overall organizational performance."
+        insights = generate_insight('Time to First Sale', df, name, stats, version)
         return fig, insights
 
     # Create a DataFrame for the chart
@@ -898,26 +1121,11 @@ def create_time_to_first_sale_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = f"Time to first sale analysis across {name} categories reveals important onboarding efficiency patterns. "
-    
-    if name == "Gender":
-        insights += "Gender differences in time to first sale may indicate opportunities to optimize training approaches for different groups."
-    elif name == "Education":
-        insights += "Educational background correlates with speed to productivity, suggesting tailored onboarding programs by education level."
-    elif name == "Experience":
-        insights += "Experience-based variations in time to first sale highlight opportunities to leverage prior skills during onboarding."
-    elif name == "Age":
-        insights += "Age-based differences in time to first sale suggest potential for age-specific training optimization."
-    
-    insights += " Reducing time to productivity remains a key factor in improving overall organizational performance."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('Time to First Sale', df, name, stats, version)
     return fig, insights
     
-def create_car2catpo_ratio_chart(df, name):
+def create_car2catpo_ratio_chart(df, name, stats=None, derived=None, version=None):
     """Create the CAR2CATPO ratio chart."""
     fig, ax = setup_chart_style()
     
@@ -929,10 +1137,8 @@ def create_car2catpo_ratio_chart(df, name):
         # Draw a simple placeholder chart with error message
         ax.text(0.5, 0.5, "Missing data column for CAR2CATPO ratio", 
                 ha='center', va='center', fontsize=14, color='red')
-        st.pyplot(fig, use_container_width=True)
         
-        insights = f"The CAR2CATPO ratio analysis across {name} categories reveals important operational efficiency patterns. "
-        insights += "Understanding these patterns can help optimize resource allocation and workflow design."
+        insights = generate_insight('CAR2CATPO Ratio', df, name, stats, version)
         return fig, insights
 
     # Create a DataFrame for the chart
@@ -989,53 +1195,38 @@ def create_car2catpo_ratio_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = f"The CAR2CATPO ratio analysis across {name} categories reveals important operational efficiency patterns. "
-    
-    if name == "Gender":
-        insights += "Gender-based ratio differences may indicate varying approaches to handling client interactions and workflow management."
-    elif name == "Education":
-        insights += "Educational background appears to influence operational efficiency metrics, with certain education levels showing better process optimization."
-    elif name == "Experience":
-        insights += "Experience levels demonstrate varying operational efficiency patterns, suggesting experience-specific process optimization opportunities."
-    elif name == "Age":
-        insights += "Age groups show different operational efficiency metrics, highlighting potential for age-targeted process improvement initiatives."
-    
-    insights += " Understanding these patterns can help optimize resource allocation and workflow design."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('CAR2CATPO Ratio', df, name, stats, version)
     return fig, insights
     
-def create_attrition_count_chart(df, name):
+def create_attrition_count_chart(df, name, stats=None, derived=None, version=None):
     """Create the attrition count chart."""
     fig, ax = setup_chart_style()
     
-    # Get the 13th and 14th columns (indices 12 and 13)
-    col13 = df.columns[12] if len(df.columns) > 12 else None  # Total employees
-    col14 = df.columns[13] if len(df.columns) > 13 else None  # Attrited employees
+    # Get the 2nd and 14th columns (indices 1 and 13)
+    col2 = df.columns[1] if len(df.columns) > 1 else None  # CAP LRM cohort, the employees of the cohort
+    col14 = df.columns[13] if len(df.columns) > 13 else None  # Attrited employees of the LRM cohort
     
     # Check if we have the necessary columns
-    if col13 is None or col14 is None:
+    if col2 is None or col14 is None:
         # Draw a simple placeholder chart with error message
         ax.text(0.5, 0.5, "Missing data columns for attrition analysis", 
                 ha='center', va='center', fontsize=14, color='red')
-        st.pyplot(fig, use_container_width=True)
         
-        insights = f"Analysis of attrition patterns across {name} categories reveals important retention trends. "
-        insights += "Understanding these patterns can help develop targeted retention strategies and improve employee satisfaction."
+        insights = generate_insight('Attrition Count', df, name, stats, version)
         return fig, insights
 
     # Create a DataFrame for the chart
     attrition_data = pd.DataFrame({
         'Category': df['Category'],
         'Attrited Employees': df[col14],
-        'Total Employees': df[col13]
+        'Total Employees': df[col2]
     })
 
-    # Calculate attrition rates
-    attrition_data['Attrition Rate'] = (attrition_data['Attrited Employees'] / attrition_data['Total Employees'] * 100)
+    # Attrition rates come from the derived metrics
+    if derived is None:
+        derived = compute_derived_metrics(df)
+    attrition_data['Attrition Rate'] = derived[ATTRITION_RATE]
 
     # Using seaborn barplot (fixed deprecation warning)
     # Generate a palette with enough colors for all categories
@@ -1083,45 +1274,11 @@ def create_attrition_count_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Get the 13th and 14th columns (indices 12 and 13)
-    col13 = df.columns[12] if len(df.columns) > 12 else None
-    col14 = df.columns[13] if len(df.columns) > 13 else None
-    
-    # Generate insights based on the data
-    insights = ""
-    
-    # Check if we have the necessary columns
-    if col13 and col14:
-        # Find category with highest attrition rate
-        try:
-            total_employees = df[col13].sum() if not df[col13].empty else 0
-            total_attrition = df[col14].sum() if not df[col14].empty else 0
-            overall_rate = (total_attrition / total_employees) * 100 if total_employees > 0 else 0
-            
-            insights = f"The overall employee attrition rate across all {name} categories is {overall_rate:.1f}%. "
-            
-            # Add category-specific recommendations
-            if name == "Education":
-                insights += "Educational background appears to correlate with retention patterns, suggesting targeted retention strategies by education level."
-            elif name == "Experience":
-                insights += "Experience-based attrition patterns indicate tenure-specific retention strategies may be beneficial."
-            elif name == "Age":
-                insights += "Age-based attrition differences highlight potential for age-specific engagement initiatives."
-            elif name == "Gender":
-                insights += "Gender-based attrition disparities may inform diversity and inclusion strategy improvements."
-        except Exception as e:
-            insights = f"Analysis of attrition patterns across {name} categories reveals important retention trends. "
-            insights += "Understanding these patterns can help develop targeted retention strategies and improve employee satisfaction."
-    else:
-        insights = f"Analysis of attrition patterns across {name} categories reveals important retention trends. "
-        insights += "Understanding these patterns can help develop targeted retention strategies and improve employee satisfaction."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('Attrition Count', df, name, stats, version)
     return fig, insights
     
-def create_average_residency_chart(df, name):
+def create_average_residency_chart(df, name, stats=None, derived=None, version=None):
     """Create the average residency chart."""
     fig, ax = setup_chart_style()
     
@@ -1134,10 +1291,8 @@ def create_average_residency_chart(df, name):
         # Draw a simple placeholder chart with error message
         ax.text(0.5, 0.5, "Missing data columns for average residency analysis", 
                 ha='center', va='center', fontsize=14, color='red')
-        st.pyplot(fig, use_container_width=True)
         
-        insights = f"Average residency analysis across {name} categories reveals important employee retention patterns. "
-        insights += "The comparison between top performers and all employees provides valuable insights for talent development strategies."
+        insights = generate_insight('Average Residency', df, name, stats, version)
         return fig, insights
 
     # Create shorter column names for display
@@ -1151,9 +1306,10 @@ def create_average_residency_chart(df, name):
         col16_short: df[col16]
     })
 
-    # Calculate the percentage differences between Top 100 and All employees
-    for idx, row in residency_data.iterrows():
-        residency_data.loc[idx, 'Percentage Diff'] = ((row[col16_short] - row[col15_short]) / row[col15_short]) * 100 if row[col15_short] > 0 else 0
+    # The percentage differences between Top 100 and All employees come from the derived metrics
+    if derived is None:
+        derived = compute_derived_metrics(df)
+    residency_data['Percentage Diff'] = derived[RESIDENCY_PCT_DIFF]
 
     # Reshape data for seaborn
     residency_melted = pd.melt(residency_data, 
@@ -1211,68 +1367,29 @@ def create_average_residency_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = ""
-    
-    # Check if we have the necessary columns
-    if col15 and col16:
-        try:
-            # Calculate average tenure differences between top performers and all employees
-            top_avg = df[col16].mean() if not df[col16].empty else 0
-            all_avg = df[col15].mean() if not df[col15].empty else 0
-            diff = top_avg - all_avg
-            pct_diff = (diff / all_avg) * 100 if all_avg > 0 else 0
-            
-            # Generate insights
-            insights = f"Top performers have on average {top_avg:.2f} months of tenure compared to {all_avg:.2f} months for all employees, "
-            if diff > 0:
-                insights += f"representing {pct_diff:.1f}% longer tenure for high performers. "
-            else:
-                insights += f"representing {abs(pct_diff):.1f}% shorter tenure for high performers. "
-            
-            # Add category-specific insights
-            if name == "Education":
-                insights += "Educational background appears to correlate with tenure patterns among top performers."
-            elif name == "Experience":
-                insights += "Experience levels show varying tenure patterns, suggesting experience-based development opportunities."
-            elif name == "Age":
-                insights += "Age-based tenure differences highlight opportunities for cross-generational mentoring and knowledge transfer."
-            elif name == "Gender":
-                insights += "Gender-based tenure variations may inform talent development strategies."
-        except Exception as e:
-            insights = f"Average residency analysis across {name} categories reveals important employee retention patterns. "
-            insights += "The comparison between top performers and all employees provides valuable insights for talent development strategies."
-    else:
-        insights = f"Average residency analysis across {name} categories reveals important employee retention patterns. "
-        insights += "The comparison between top performers and all employees provides valuable insights for talent development strategies."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('Average Residency', df, name, stats, version)
     return fig, insights
     
-def create_infant_attrition_chart(df, name):
+def create_infant_attrition_chart(df, name, stats=None, derived=None, version=None):
     """Create the infant attrition chart."""
     fig, ax = setup_chart_style()
     
-    # Get the last column (index 17)
-    last_col = df.columns[-1] if len(df.columns) > 16 else None
-    
-    # Check if we have the necessary column
-    if last_col is None:
+    # Check if we have the infant attrition column (index 17)
+    if len(df.columns) <= INFANT_ATTRITION_POSITION:
         # Draw a simple placeholder chart with error message
         ax.text(0.5, 0.5, "Missing data column for infant attrition analysis", 
                 ha='center', va='center', fontsize=14, color='red')
-        st.pyplot(fig, use_container_width=True)
         
-        insights = f"Infant attrition analysis across {name} categories reveals important early-stage retention patterns. "
-        insights += "Understanding these patterns can help improve onboarding and initial employee engagement strategies."
+        insights = generate_insight('Infant Attrition', df, name, stats, version)
         return fig, insights
 
-    # Create a DataFrame for the chart with a shorter column name for display
+    # Create a DataFrame for the chart with the percentage from the derived metrics
+    if derived is None:
+        derived = compute_derived_metrics(df)
     infant_attrition_data = pd.DataFrame({
         'Category': df['Category'],
-        'Infant Attrition': df[last_col] * 100  # Convert to percentage
+        'Infant Attrition': derived[INFANT_ATTRITION_PCT]
     })
 
     # Using seaborn barplot (fixed deprecation warning)
@@ -1325,53 +1442,8 @@ def create_infant_attrition_chart(df, name):
     # Add more padding around figure
     plt.tight_layout(pad=3.0)
     
-    # Use full width in Streamlit
-    st.pyplot(fig, use_container_width=True)
-    
-    # Generate insights based on the data
-    insights = ""
-    
-    # Check if we have the necessary column
-    if last_col:
-        try:
-            # Calculate average infant attrition
-            avg_attrition = df[last_col].mean() * 100 if not df[last_col].empty else 0
-            
-            # Find categories with highest and lowest infant attrition
-            highest_idx = df[last_col].idxmax() if not df[last_col].empty else 0
-            lowest_idx = df[last_col].idxmin() if not df[last_col].empty else 0
-            
-            highest_category = df.loc[highest_idx, 'Category'] if highest_idx in df.index else ""
-            highest_rate = df.loc[highest_idx, last_col] * 100 if highest_idx in df.index else 0
-            
-            lowest_category = df.loc[lowest_idx, 'Category'] if lowest_idx in df.index else ""
-            lowest_rate = df.loc[lowest_idx, last_col] * 100 if lowest_idx in df.index else 0
-            
-            # Generate insights
-            if highest_category and lowest_category:
-                insights = f"The {highest_category} {name} category has the highest infant attrition rate at {highest_rate:.1f}%, "
-                insights += f"while the {lowest_category} category has the lowest at {lowest_rate:.1f}%. "
-                insights += f"The overall infant attrition average is {avg_attrition:.1f}% across all {name} categories. "
-                
-                # Add category-specific recommendations
-                if name == "Education":
-                    insights += "Educational background appears to impact early attrition, suggesting education-specific onboarding adjustments may be beneficial."
-                elif name == "Experience":
-                    insights += "Experience levels show varying early attrition patterns, highlighting opportunities to strengthen onboarding for specific experience groups."
-                elif name == "Age":
-                    insights += "Age-based early attrition differences suggest tailoring early employment support by age group."
-                elif name == "Gender":
-                    insights += "Gender-based early attrition disparities may inform improved orientation and early career development programs."
-            else:
-                insights = f"Infant attrition analysis across {name} categories reveals important early-stage retention patterns. "
-                insights += "Understanding these patterns can help improve onboarding and initial employee engagement strategies."
-        except Exception as e:
-            insights = f"Infant attrition analysis across {name} categories reveals important early-stage retention patterns. "
-            insights += "Understanding these patterns can help improve onboarding and initial employee engagement strategies."
-    else:
-        insights = f"Infant attrition analysis across {name} categories reveals important early-stage retention patterns. "
-        insights += "Understanding these patterns can help improve onboarding and initial employee engagement strategies."
-    
+    # Insight text comes from the compiled templates, memoized per dataset version
+    insights = generate_insight('Infant Attrition', df, name, stats, version)
     return fig, insights
     
     # Get the last column (index 17)
@@ -1431,5 +1503,78 @@ def create_infant_attrition_chart(df, name):
     # Use full width in Streamlit
     st.pyplot(fig, use_container_width=True)
 
+# Chart creation functions keyed by their display name
+CHART_FUNCTIONS = {
+    'Distribution': create_distribution_chart,
+    'KPI Performance': create_kpi_performance_chart,
+    'Performance Multiple': create_performance_multiple_chart,
+    'Top vs Bottom Performers': create_top_bottom_performers_chart,
+    'Time to First Sale': create_time_to_first_sale_chart,
+    'CAR2CATPO Ratio': create_car2catpo_ratio_chart,
+    'Attrition Count': create_attrition_count_chart,
+    'Average Residency': create_average_residency_chart,
+    'Infant Attrition': create_infant_attrition_chart
+}
+
+# Metrics (by short name) drawn on each chart, used to attach anomaly notes to its insights
+CHART_METRICS = {
+    'Distribution': ['CAP LRM Cohort', 'CAP 12 Cohort'],
+    'KPI Performance': ['Combined KPI Achievement', 'KPI 1 Achievement'],
+    'Performance Multiple': ['Performance Multiple (Combined)', 'Performance Multiple (KPI 1)'],
+    'Top vs Bottom Performers': ['Top 10% CAP (Combined)', 'Bottom 10% CAP (Combined)',
+                                 'Top 10% CAP (KPI 1)', 'Bottom 10% CAP (KPI 1)'],
+    'Time to First Sale': ['Time to First Sale'],
+    'CAR2CATPO Ratio': ['CAR2CATPO Ratio'],
+    'Attrition Count': ['Attrited Employees'],
+    'Average Residency': ['Average Residency (All)', 'Average Residency (Top 100)'],
+    'Infant Attrition': ['Infant Attrition']
+}
+
+@st.cache_data(show_spinner=False)
+def get_insight_index(sheets):
+    """Return the version of the data and the generated insights of every chart of every sheet, keyed like recommendations."""
+    insights = {}
+    versions = []
+    for name, df in sheets.items():
+        stats = get_sheet_statistics(df)
+        version = dataset_version(df)
+        versions.append(version)
+        for chart_name in INSIGHT_BUILDERS:
+            insights[f"{name}_{chart_name}_recommendation"] = generate_insight(chart_name, df, name, stats, version)
+    return '-'.join(versions), insights
+
+def create_search_view(sheets):
+    """Search the saved recommendations and generated insights of all chart cards."""
+    with st.expander("🔎 Search Recommendations and Insights"):
+        query = st.text_input("Search for words in recommendations and insights:", key="recommendation_search",
+                              placeholder="e.g. onboarding")
+        if not query.strip():
+            return
+        
+        # Index the insights outside the cached function, so a recreated store is filled again;
+        # each session writes them once per version of the data
+        version, insights = get_insight_index(sheets)
+        if st.session_state.get(INSIGHT_INDEX_KEY) != version and index_insights(insights):
+            st.session_state[INSIGHT_INDEX_KEY] = version
+        
+        results = search_recommendations(query)
+        if not results:
+            st.info(f"No chart cards mention '{query}'")
+            return
+        
+        st.markdown(f"**{len(results)} matching cards**, saved recommendations first, best matches first")
+        for result in results:
+            if result['source'] == 'recommendation':
+                source = f"Saved recommendation, {html.escape(result['namespace'])}"
+            else:
+                source = "Generated insight"
+            st.markdown(f"""
+                <div style='padding: 8px 12px; margin-bottom: 8px; border-left: 4px solid #0A2472; background-color: #f8f9fa;'>
+                    <strong>{html.escape(result['category'])} · {html.escape(result['chart'])}</strong>
+                    <span style='color: #777; font-size: 12px;'>({source})</span><br>
+                    <span style='font-size: 14px;'>{result['snippet']}</span>
+                </div>
+            """, unsafe_allow_html=True)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,86 @@
+import numpy as np
+
+from aadhar_data import METRIC_NAMES
+from category_ranking import aggregate_categories, COUNT_POSITIONS
+
+# Metrics stored as fractions and adjusted in percentage points; all others are adjusted by a relative %
+POINT_METRICS = {'Combined KPI Achievement', 'KPI 1 Achievement', 'Early Attrition', 'Infant Attrition'}
+
+# Metrics recomputed by the model rather than adjusted directly
+DEPENDENT_METRICS = {'Attrited Employees'}
+
+ADJUSTABLE_METRICS = [metric for metric in METRIC_NAMES if metric not in DEPENDENT_METRICS]
+
+def simulate(df, categories, changes):
+    """
+    Apply what-if changes to the chosen categories of a sheet and recompute dependent metrics.
+
+    `changes` maps metric short names to a change in percentage points (POINT_METRICS) or
+    a relative change in % (all other metrics). Attrited employees follow the attrition
+    rates: every point of early attrition moves that share of the CAP LRM cohort, and
+    every point of infant attrition moves that share of the attrited employees. All rows
+    are updated at once with numpy. Returns the simulated sheet and the changed metrics.
+    """
+    columns = dict(zip(METRIC_NAMES, df.columns[1:]))
+    names = [metric for metric in METRIC_NAMES if metric in columns]
+    before = df[[columns[metric] for metric in names]].to_numpy(dtype=float)
+    after = before.copy()
+    rows = df['Category'].isin(categories).to_numpy()
+    position = {metric: j for j, metric in enumerate(names)}
+
+    for metric, change in changes.items():
+        if metric not in position or not change:
+            continue
+        j = position[metric]
+        if metric in POINT_METRICS:
+            after[rows, j] = np.maximum(after[rows, j] + change / 100, 0)
+        else:
+            after[rows, j] = np.maximum(after[rows, j] * (1 + change / 100), 0)
+
+    if 'Attrited Employees' in position:
+        attrited = position['Attrited Employees']
+        moved = np.zeros(len(df))
+        if 'Early Attrition' in position and 'CAP LRM Cohort' in position:
+            early = position['Early Attrition']
+            moved += (after[:, early] - before[:, early]) * before[:, position['CAP LRM Cohort']]
+        if 'Infant Attrition' in position:
+            infant = position['Infant Attrition']
+            moved += (after[:, infant] - before[:, infant]) * before[:, attrited]
+        after[:, attrited] = np.maximum(before[:, attrited] + np.nan_to_num(moved), 0)
+
+    simulated = df.copy()
+    simulated[[columns[metric] for metric in names]] = after
+
+    changed = [metric for metric, j in position.items()
+               if not np.allclose(before[:, j], after[:, j], equal_nan=True)]
+    return simulated, changed
+
+def impact_summary(df, simulated, categories, metrics):
+    """
+    Compare the chosen categories with all categories, before and after a simulation.
+
+    "All categories" is the total for head counts and the cohort-weighted average for
+    rates, as in the aggregated Other bar; the gap to it is only given for rates.
+    """
+    columns = dict(zip(METRIC_NAMES, df.columns[1:]))
+    rows = df['Category'].isin(categories).to_numpy()
+    overall_before = aggregate_categories(df).iloc[0]
+    overall_after = aggregate_categories(simulated).iloc[0]
+
+    summary = []
+    for metric in metrics:
+        column = columns[metric]
+        is_count = METRIC_NAMES.index(metric) + 1 in COUNT_POSITIONS
+        combine = 'sum' if is_count else 'mean'
+        chosen_before = df.loc[rows, column].agg(combine)
+        chosen_after = simulated.loc[rows, column].agg(combine)
+        summary.append({
+            'Metric': metric,
+            'Chosen categories (before)': chosen_before,
+            'Chosen categories (after)': chosen_after,
+            'All categories (before)': overall_before[column],
+            'All categories (after)': overall_after[column],
+            'Gap vs all (before)': np.nan if is_count else chosen_before - overall_before[column],
+            'Gap vs all (after)': np.nan if is_count else chosen_after - overall_after[column]
+        })
+    return summary
@@ -0,0 +1,70 @@
+import pandas as pd
+
+from category_ranking import aggregate_groups
+
+# Levels of the zone hierarchy, from the top down; the last level holds the sheet's rows
+ZONE_LEVELS = ['National', 'Region', 'City']
+
+# Name of the single node at the top of the hierarchy
+NATIONAL = 'National'
+
+# Region of every city in the Zone sheet; cities missing here roll up into UNASSIGNED_REGION
+CITY_REGIONS = {
+    'Delhi': 'North', 'Jaipur': 'North', 'Lucknow': 'North', 'Kanpur': 'North',
+    'Ghaziabad': 'North', 'Ludhiana': 'North', 'Agra': 'North', 'Faridabad': 'North',
+    'Chandigarh': 'North', 'Dehradun': 'North', 'Jammu': 'North',
+    'Mumbai': 'West', 'Ahmedabad': 'West', 'Pune': 'West', 'Thane': 'West',
+    'Vadodara': 'West', 'Nashik': 'West',
+    'Indore': 'Central', 'Bhopal': 'Central', 'Nagpur': 'Central',
+    'Kolkata': 'East', 'Patna': 'East', 'Ranchi': 'East', 'Guwahati': 'East',
+    'Chennai': 'South', 'Bengaluru': 'South', 'Hyderabad': 'South',
+    'Visakhapatnam': 'South', 'Thiruvananthapuram': 'South'
+}
+UNASSIGNED_REGION = 'Unassigned'
+
+def zone_hierarchy(df, city_regions=CITY_REGIONS):
+    """Return the hierarchy path (one column per level in ZONE_LEVELS) of every row of a Zone sheet"""
+    cities = df['Category'].astype(str)
+    return pd.DataFrame({
+        'National': NATIONAL,
+        'Region': cities.map(city_regions).fillna(UNASSIGNED_REGION),
+        'City': cities
+    }, index=df.index)[ZONE_LEVELS]
+
+def build_rollups(df, hierarchy):
+    """
+    Precompute the roll-up of every metric at every level of a hierarchy.
+
+    `hierarchy` has one column per level, top level first, giving each sheet row's path;
+    the last level is the sheet's own rows. Every node above the leaves is aggregated
+    straight from its leaf rows (head counts summed, rates weighted by cohort head count).
+    The result maps (level, parent) to a sheet-shaped frame of that parent's children,
+    with (top level, None) holding the top node itself, so each drill step is a lookup.
+    """
+    levels = list(hierarchy.columns)
+    rollups = {}
+    for depth, level in enumerate(levels):
+        if depth == len(levels) - 1:
+            frame = df.assign(Category=hierarchy[level].to_numpy())
+        else:
+            frame = aggregate_groups(df, hierarchy[level])
+
+        if depth == 0:
+            rollups[(level, None)] = frame
+            continue
+
+        # Parent of every node at this level, taken from the first row on its path
+        parents = hierarchy.groupby(level, sort=False)[levels[depth - 1]].first()
+        node_parents = frame['Category'].map(parents)
+        for parent, children in frame.groupby(node_parents, sort=False):
+            rollups[(level, parent)] = children.reset_index(drop=True)
+    return rollups
+
+def build_zone_rollups(df, city_regions=CITY_REGIONS):
+    """Precompute the national, regional and city roll-ups of a Zone sheet"""
+    return build_rollups(df, zone_hierarchy(df, city_regions))
+
+def child_level(level):
+    """Return the level directly below `level` in ZONE_LEVELS, or None at the bottom"""
+    depth = ZONE_LEVELS.index(level)
+    return ZONE_LEVELS[depth + 1] if depth + 1 < len(ZONE_LEVELS) else None